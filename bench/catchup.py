@@ -0,0 +1,91 @@
+# -----------------------------------------------------------------------------
+# catchup.py
+#
+# Measure how fast a recovered site can serve reads again, with and without catch-up
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from catalog import Catalog
+from database import Database
+
+
+def readable_share(s, items, names):
+    """
+    :return: share of the replicated items at site s that read/write transactions can read,
+             items of a lazy catalog are created by the check if they were not used yet
+    """
+    return sum(1 for name in names if s.readable(items[name])) / float(len(names))
+
+
+def measure(catalog, rate, rounds, writes, seed):
+    """
+    Fail and recover site 1, then run up to rounds rounds of writes lines, each line
+    starts a transaction that writes one random item, and follow the share of readable
+    items at the recovered site after every round
+
+    :return: (round when every item is readable or None, readable share at the end,
+              seconds per tick)
+    """
+    devnull = open(os.devnull, 'w')
+    db = Database(catalog=catalog, catchup_rate=rate, out=devnull)
+    s = db.tm.sites[0]
+    names = ['x%d' % i for i in xrange(1, catalog.items + 1)
+        if 0 in catalog.site_ids(i) and len(catalog.site_ids(i)) > 1]
+    rnd = random.Random(seed)
+    db.fail(1)
+    db.tick()
+    db.recover(1)
+    db.tick()
+    full = None
+    elapsed = 0.0
+    n = 0
+    try:
+        for i in xrange(1, rounds + 1):
+            lines = []
+            for _ in xrange(writes):
+                n += 1
+                name = rnd.choice(names)
+                lines.append('begin(T%d); W(T%d, %s, %d); end(T%d)' % (n, n, name, n, n))
+            start = time.time()
+            db.run(lines)
+            elapsed += time.time() - start
+            if full is None and readable_share(s, db.items, names) == 1:
+                full = i
+                break
+    finally:
+        devnull.close()
+    return full, readable_share(s, db.items, names), elapsed / (i * writes)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--items', type=int, default=2000,
+        help='number of variables (2000)')
+    arg_parser.add_argument('--rounds', type=int, default=500,
+        help='rounds of writes to run at most (500)')
+    arg_parser.add_argument('--writes', type=int, default=5,
+        help='lines per round, each begins a transaction that writes once (5)')
+    arg_parser.add_argument('--rates', type=int, nargs='+', default=[0, 1, 10, 100],
+        help='catch-up rates to compare, 0 is no catch-up (0 1 10 100)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--eager', action='store_true',
+        help='initialize all variables at start instead of on first access')
+    args = arg_parser.parse_args()
+    catalog = Catalog(items=args.items, lazy=not args.eager)
+    print('%-8s %12s %14s %14s' % ('rate', 'full reads', 'readable', 'ms/tick'))
+    for rate in args.rates:
+        full, share, per_tick = measure(catalog, rate, args.rounds, args.writes, args.seed)
+        print('%-8d %12s %13.1f%% %14.3f' % (
+            rate, 'never' if full is None else 'round %d' % full, 100 * share,
+            1000 * per_tick))
+
+
+if __name__ == '__main__':
+    main()
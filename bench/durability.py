@@ -0,0 +1,95 @@
+# -----------------------------------------------------------------------------
+# durability.py
+#
+# Measure what the write-ahead log costs per commit, how much it writes and how
+# long a restart from it takes
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from catalog import Catalog
+from database import Database
+from transaction_manager import TransactionManager
+from parse_throughput import generate
+
+# name, whether the state is logged, fsync, whether checkpoints are taken (with garbage
+# collection at the same interval, so they are compact)
+MODES = [
+    ('memory', False, False, False),
+    ('wal', True, False, False),
+    ('wal+fsync', True, True, False),
+    ('wal+ckpt', True, True, True),
+]
+
+
+def measure(lines, catalog, durable, sync, checkpoint_interval):
+    """
+    Run the script, in a fresh log directory if durable, then restart from it
+
+    :return: (commits, seconds, log stats or None, restart seconds or None)
+    """
+    options = dict()
+    wal_dir = None
+    if durable:
+        wal_dir = tempfile.mkdtemp(prefix='adb-wal-')
+        options = dict(wal_dir=wal_dir, wal_sync=sync, checkpoint_interval=checkpoint_interval,
+            gc_interval=checkpoint_interval)
+    try:
+        with open(os.devnull, 'w') as devnull:
+            db = Database(catalog=catalog, out=devnull, **options)
+            start = time.time()
+            try:
+                db.run(lines)
+            except SystemExit:
+                pass
+            finally:
+                elapsed = time.time() - start
+        tm = db.tm
+        committed = tm.committed
+        if wal_dir is None:
+            return committed, elapsed, None, None
+        stats = tm.log_stats()
+        stats['size'] = sum(os.path.getsize(os.path.join(wal_dir, f))
+            for f in os.listdir(wal_dir))
+        start = time.time()
+        restarted = TransactionManager(sites=catalog.sites, wal_dir=wal_dir)
+        catalog.build(restarted)
+        restart = time.time() - start
+        return committed, elapsed, stats, restart
+    finally:
+        if wal_dir is not None:
+            shutil.rmtree(wal_dir)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--lines', type=int, default=20000,
+        help='number of input lines (20000)')
+    arg_parser.add_argument('--checkpoint-interval', type=int, default=1000,
+        help='ticks between checkpoints and garbage collections of the wal+ckpt run (1000)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    lines = generate(args.lines, args.seed)
+    catalog = Catalog()
+    print('%-10s %8s %12s %10s %8s %8s %10s %10s' % ('mode', 'commits', 'ms/commit',
+        'records', 'flushes', 'ckpts', 'disk (KB)', 'restart'))
+    for name, durable, sync, checkpoints in MODES:
+        committed, elapsed, stats, restart = measure(lines, catalog, durable, sync,
+            args.checkpoint_interval if checkpoints else None)
+        row = '%-10s %8d %12.3f' % (name, committed, 1000 * elapsed / max(committed, 1))
+        if stats is None:
+            print(row)
+        else:
+            print(row + ' %10d %8d %8d %10.1f %9.3fs' % (stats['records'], stats['flushes'],
+                stats['checkpoints'], stats['size'] / 1024.0, restart))
+
+
+if __name__ == '__main__':
+    main()
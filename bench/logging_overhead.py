@@ -0,0 +1,72 @@
+# -----------------------------------------------------------------------------
+# logging_overhead.py
+#
+# Measure what logging costs at each verbosity of adb.py
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import time
+import logging
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from database import Database
+from parse_throughput import generate
+
+# verbosity flag and the level adb.py sets for it
+LEVELS = [('quiet', 100), ('-v', 20), ('-vv', 10), ('-vvv', 0)]
+
+
+def measure(lines, level, repeat, out):
+    """
+    Run the script with log records formatted and written to /dev/null
+
+    :return: best time of repeat runs in seconds
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    best = None
+    for _ in xrange(repeat):
+        db = Database(out=out)
+        start = time.time()
+        try:
+            db.run(lines)
+        except SystemExit:
+            pass
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--lines', type=int, default=20000,
+        help='number of input lines (20000)')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+        help='runs per verbosity, the best one is reported (3)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('infile', nargs='?', type=argparse.FileType('rU'),
+        help='script to run instead of a generated one')
+    args = arg_parser.parse_args()
+    lines = args.infile.readlines() if args.infile else generate(args.lines, args.seed)
+    devnull = open(os.devnull, 'w')
+    handler = logging.StreamHandler(devnull)
+    handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    logging.getLogger().addHandler(handler)
+    try:
+        results = [(flag, measure(lines, level, args.repeat, devnull))
+            for flag, level in LEVELS]
+    finally:
+        devnull.close()
+    quiet = results[0][1]
+    print('%-8s %10s %14s %10s' % ('flags', 'seconds', 'lines/sec', 'overhead'))
+    for flag, elapsed in results:
+        print('%-8s %10.3f %14.0f %9.1f%%' % (
+            flag, elapsed, len(lines) / max(elapsed, 1e-9),
+            100 * (elapsed - quiet) / max(quiet, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+# -----------------------------------------------------------------------------
+# operation_queue.py
+#
+# Measure time and memory to queue many operations that never run
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import gc
+import time
+import resource
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from database import Database
+
+
+def max_rss():
+    """
+    :return: peak resident set size of this process in MB (Linux reports KB)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--operations', type=int, default=1000000,
+        help='number of operations to queue (1000000)')
+    arg_parser.add_argument('--per-transaction', type=int, default=10,
+        help='operations queued by each transaction (10)')
+    args = arg_parser.parse_args()
+    db = Database()
+    items = [db.items['x%d' % i] for i in xrange(1, 21)]
+    gc.collect()
+    before = max_rss()
+    start = time.time()
+    transactions = []
+    for i in xrange(0, args.operations, args.per_transaction):
+        name = 'T%d' % i
+        t = db.begin(name)
+        transactions.append(t)
+        for k in xrange(args.per_transaction - 1):
+            x = items[(i + k) % len(items)]
+            if k % 2:
+                db.write(t, x, k)
+            else:
+                db.read(t, x)
+        db.end(t)
+    elapsed = time.time() - start
+    queued = sum(len(t.operations) for t in transactions)
+    growth = max_rss() - before
+    print('%d transactions, %d operations queued' % (len(transactions), queued))
+    print('%-22s %10.3f' % ('seconds', elapsed))
+    print('%-22s %10.0f' % ('operations/sec', queued / max(elapsed, 1e-9)))
+    print('%-22s %10.1f' % ('peak RSS growth (MB)', growth))
+    print('%-22s %10.1f' % ('bytes/operation', growth * 1024 * 1024 / max(queued, 1)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+# -----------------------------------------------------------------------------
+# parse_throughput.py
+#
+# Compare the scanner fast path with the PLY parser on a large script
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+import scanner
+from database import Database
+
+
+def generate(num_lines, seed):
+    """
+    A script of plain commands, transactions of a few reads and writes each
+
+    :return: list of lines
+    """
+    rnd = random.Random(seed)
+    lines = []
+    n = 0
+    while len(lines) < num_lines:
+        n += 1
+        name = 'T%d' % n
+        lines.append('begin(%s)' % name)
+        for _ in xrange(rnd.randint(1, 6)):
+            x = rnd.randint(1, 20)
+            if rnd.random() < 0.5:
+                lines.append('R(%s, x%d)' % (name, x))
+            else:
+                lines.append('W(%s, x%d, %d); R(%s, x%d)' % (
+                    name, x, rnd.randint(0, 999), name, x))
+        lines.append('end(%s) // done' % name)
+    return lines[:num_lines]
+
+
+def measure(parse, lines, out):
+    """
+    Parse every line into a fresh database, operations are queued but never run
+
+    :param parse:   function of a database and a line
+    :return:        seconds spent
+    """
+    db = Database(out=out)
+    start = time.time()
+    for s in lines:
+        db.tm.sleep()
+        parse(db, s)
+    return time.time() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--lines', type=int, default=100000,
+        help='number of input lines (100000)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('infile', nargs='?', type=argparse.FileType('rU'),
+        help='script to parse instead of a generated one')
+    args = arg_parser.parse_args()
+    lines = args.infile.readlines() if args.infile else generate(args.lines, args.seed)
+    with open(os.devnull, 'w') as devnull:
+        ply = measure(lambda db, s: db.parser.parse(s, lexer=db.lexer), lines, devnull)
+        fast = measure(Database.parse, lines, devnull)
+    start = time.time()
+    for s in lines:
+        scanner.scan(s)
+    scan = time.time() - start
+    print('%-14s %10s %14s' % ('parser', 'seconds', 'lines/sec'))
+    for name, elapsed in [('ply', ply), ('fast path', fast), ('scan only', scan)]:
+        print('%-14s %10.3f %14.0f' % (name, elapsed, len(lines) / max(elapsed, 1e-9)))
+    print('speedup %.1fx' % (ply / max(fast, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
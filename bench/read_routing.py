@@ -0,0 +1,94 @@
+# -----------------------------------------------------------------------------
+# read_routing.py
+#
+# Compare how each read routing policy spreads reads over the replicas
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from database import Database
+from lock import Policy
+from routing import Routing
+
+
+def generate(num_lines, clients, write_ratio, seed):
+    """
+    A read heavy script where clients transactions run side by side, each line
+    holds one operation of every client. Only replicated (even) variables are used.
+
+    :return: list of lines
+    """
+    rnd = random.Random(seed)
+    items = range(2, 21, 2)
+    lines = []
+    active = [None] * clients
+    n = 0
+    while len(lines) < num_lines:
+        ops = []
+        for c in xrange(clients):
+            name = active[c]
+            if name is None:
+                n += 1
+                name = active[c] = 'T%d' % n
+                ops.append('begin(%s)' % name)
+            elif rnd.random() < 0.1:
+                ops.append('end(%s)' % name)
+                active[c] = None
+            elif rnd.random() < write_ratio:
+                ops.append('W(%s, x%d, %d)' % (name, rnd.choice(items), rnd.randint(0, 999)))
+            else:
+                ops.append('R(%s, x%d)' % (name, rnd.choice(items)))
+        lines.append('; '.join(ops))
+    return lines
+
+
+def measure(lines, routing, options):
+    """
+    Run the script with one routing policy
+
+    :return: (ticks, commits, aborts, seconds, reads per site)
+    """
+    with open(os.devnull, 'w') as devnull:
+        db = Database(routing=routing, out=devnull, **options)
+        start = time.time()
+        try:
+            db.run(lines)
+        except SystemExit:
+            pass
+        finally:
+            elapsed = time.time() - start
+    tm = db.tm
+    return (tm.timestamp, tm.committed, tm.aborted, elapsed,
+        tm.read_counts())
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--lines', type=int, default=5000,
+        help='number of input lines (5000)')
+    arg_parser.add_argument('--clients', type=int, default=8,
+        help='transactions running at the same time (8)')
+    arg_parser.add_argument('--write-ratio', type=float, default=0.05,
+        help='share of operations that are writes (0.05)')
+    arg_parser.add_argument('-p', '--policy', default='wait-die',
+        help='lock conflict policy (wait-die)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+    lines = generate(args.lines, args.clients, args.write_ratio, args.seed)
+    options = dict(policy=Policy[args.policy.replace('-', '_')])
+    print('%-14s %8s %8s %8s %10s %10s %10s' % (
+        'routing', 'ticks', 'commits', 'aborts', 'seconds', 'max reads', 'min reads'))
+    for routing in Routing:
+        ticks, committed, aborted, elapsed, reads = measure(lines, routing, options)
+        print('%-14s %8d %8d %8d %10.3f %10d %10d' % (
+            routing.name, ticks, committed, aborted, elapsed, max(reads), min(reads)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+# -----------------------------------------------------------------------------
+# suite.py
+#
+# Run generated workloads, report throughput and memory, and compare with a baseline
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, 'src'))
+from catalog import Catalog
+from database import Database
+from lock import Policy
+import workload
+
+# name, arguments of workload.generate
+WORKLOADS = [
+    ('uniform', dict()),
+    ('skewed', dict(skew=1.2)),
+    ('read-mostly', dict(write_ratio=0.05, read_only=0.5)),
+    ('write-heavy', dict(write_ratio=0.8, read_only=0.0)),
+    ('failures', dict(fail_rate=0.05)),
+    ('large', dict(items=10000, concurrency=50, skew=0.8)),
+]
+
+# metrics where larger is better, compared with the baseline
+RATES = ['ticks/sec', 'ops/sec']
+
+
+def run_one(name, policy, scale, repeat):
+    """
+    Generate and run one workload in this process, runs are repeated and the best time is kept
+
+    :return: dictionary of metrics
+    """
+    options = dict(dict(WORKLOADS)[name], transactions=int(1000 * scale))
+    lines = list(workload.generate(**options))
+    catalog = Catalog(items=options.get('items', 20), sites=options.get('sites', 10))
+    before = max_rss()
+    elapsed = None
+    devnull = open(os.devnull, 'w')
+    for _ in xrange(repeat):
+        db = Database(catalog=catalog, policy=policy, out=devnull)
+        start = time.time()
+        try:
+            db.run(lines)
+        except SystemExit:
+            pass
+        finally:
+            run = time.time() - start
+            elapsed = run if elapsed is None else min(elapsed, run)
+    devnull.close()
+    tm = db.tm
+    return {
+        'lines': len(lines),
+        'ticks/sec': tm.timestamp / max(elapsed, 1e-9),
+        'ops/sec': tm.completed_operations / max(elapsed, 1e-9),
+        'commits': tm.committed,
+        'aborts': tm.aborted,
+        'seconds': elapsed,
+        'peak MB': max_rss(),
+        'growth MB': max_rss() - before,
+    }
+
+
+def max_rss():
+    """
+    :return: peak resident set size of this process in MB (Linux reports KB)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def run_all(names, policy, scale, repeat):
+    """
+    Run every workload in its own process, so that peak memory is its own
+
+    :return: dictionary from workload name to metrics
+    """
+    results = dict()
+    for name in names:
+        output = subprocess.check_output([sys.executable, __file__, '--one', name,
+            '--policy', policy.name.replace('_', '-'), '--scale', str(scale),
+            '--repeat', str(repeat)])
+        results[name] = json.loads(output)
+    return results
+
+
+def report(results, names, baseline=None, tolerance=0.2):
+    """
+    Print one row per workload, with the change of each rate against the baseline
+
+    :return: list of (workload, metric) that are slower than the baseline beyond tolerance
+    """
+    regressions = []
+    print('%-12s %8s %12s %12s %8s %8s %9s' % (
+        'workload', 'lines', 'ticks/sec', 'ops/sec', 'commits', 'aborts', 'peak MB'))
+    for name in names:
+        r = results[name]
+        print('%-12s %8d %12.0f %12.0f %8d %8d %9.1f' % (name, r['lines'], r['ticks/sec'],
+            r['ops/sec'], r['commits'], r['aborts'], r['peak MB']))
+        if baseline is None or name not in baseline:
+            continue
+        old = baseline[name]
+        changes = []
+        for metric in RATES:
+            change = r[metric] / max(old[metric], 1e-9) - 1
+            changes.append('%s %+.1f%%' % (metric, 100 * change))
+            if change < -tolerance:
+                regressions.append((name, metric))
+        if (r['commits'], r['aborts']) != (old['commits'], old['aborts']):
+            changes.append('commits/aborts were %d/%d' % (old['commits'], old['aborts']))
+        print('%-12s %s' % ('', ', '.join(changes)))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-w', '--workload', action='append',
+        choices=[name for name, _ in WORKLOADS],
+        help='workload to run, may be repeated (all)')
+    arg_parser.add_argument('-p', '--policy', choices=[p.name.replace('_', '-') for p in Policy],
+        default='detect', help='lock conflict policy (detect)')
+    arg_parser.add_argument('--scale', type=float, default=1.0,
+        help='multiply the number of transactions (1000) of every workload')
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3,
+        help='runs per workload, the best time is reported (3)')
+    arg_parser.add_argument('--save', metavar='FILE',
+        help='write the results as a JSON baseline')
+    arg_parser.add_argument('--baseline', type=argparse.FileType('r'), metavar='FILE',
+        help='compare with a saved baseline, exit with 1 if a rate dropped beyond tolerance')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2,
+        help='allowed drop of ticks/sec and ops/sec against the baseline (0.2)')
+    arg_parser.add_argument('--one', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+    policy = Policy[args.policy.replace('-', '_')]
+    if args.one:
+        print(json.dumps(run_one(args.one, policy, args.scale, args.repeat)))
+        return
+    names = args.workload or [name for name, _ in WORKLOADS]
+    results = run_all(names, policy, args.scale, args.repeat)
+    baseline = None
+    if args.baseline:
+        saved = json.load(args.baseline)
+        if (saved['policy'], saved['scale']) != (policy.name, args.scale):
+            print('baseline was run with policy %s and scale %s' % (
+                saved['policy'], saved['scale']))
+        baseline = saved['workloads']
+    regressions = report(results, names, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(dict(policy=policy.name, scale=args.scale, workloads=results),
+                f, indent=2, sort_keys=True)
+    if regressions:
+        print('slower than the baseline: %s' % ', '.join(
+            '%s %s' % r for r in regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
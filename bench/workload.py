@@ -0,0 +1,146 @@
+# -----------------------------------------------------------------------------
+# workload.py
+#
+# Generate large adb scripts with a configurable mix of transactions
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import sys
+import bisect
+import random
+import argparse
+
+
+class Zipf(object):
+    """
+    Draws variable indexes 1 ... n, the k-th most popular one with probability proportional
+    to 1 / k^skew. Popularity ranks are shuffled over the variables, so hot ones are both
+    replicated (even) and single site (odd) variables. A skew of 0 is uniform.
+    """
+    def __init__(self, n, skew, rnd):
+        """
+        :param n:       number of variables
+        :param skew:    Zipf exponent
+        :param rnd:     random.Random to draw from
+        """
+        self.rnd = rnd
+        self.items = range(1, n + 1)
+        rnd.shuffle(self.items)
+        total = 0.0
+        self.cumulative = []
+        for k in xrange(1, n + 1):
+            total += 1.0 / k ** skew
+            self.cumulative.append(total)
+
+    def draw(self):
+        i = bisect.bisect_left(self.cumulative, self.rnd.random() * self.cumulative[-1])
+        return self.items[min(i, len(self.items) - 1)]
+
+
+def generate(transactions=1000, concurrency=10, operations=5, write_ratio=0.3,
+        read_only=0.1, skew=0.0, fail_rate=0.0, recover_after=10, items=20, sites=10, seed=0):
+    """
+    A script where up to concurrency transactions run side by side. Each line holds the
+    next command of every running transaction: begin, operations reads and writes, end.
+    Read-only transactions only read. Sites fail at random and recover later.
+
+    :param transactions:    number of transactions
+    :param concurrency:     number of transactions running at the same time
+    :param operations:      reads and writes per transaction
+    :param write_ratio:     share of the operations of read/write transactions that are writes
+    :param read_only:       share of the transactions that are read-only
+    :param skew:            Zipf exponent of the variable popularity, 0 is uniform
+    :param fail_rate:       probability that a running site fails on a line
+    :param recover_after:   number of lines after which a failed site recovers
+    :param items:           number of variables of the catalog
+    :param sites:           number of sites of the catalog
+    :param seed:            random seed, the same arguments give the same script
+    :return:                generator of lines
+    """
+    rnd = random.Random(seed)
+    keys = Zipf(items, skew, rnd)
+    # name, read-only, commands left
+    running = []
+    failed = dict()
+    started = 0
+    line = 0
+    while started < transactions or running:
+        line += 1
+        cmds = []
+        while len(running) < concurrency and started < transactions:
+            started += 1
+            ro = rnd.random() < read_only
+            name = 'T%d' % started
+            cmds.append(('beginRO(%s)' if ro else 'begin(%s)') % name)
+            running.append([name, ro, operations])
+        for t in list(running):
+            name, ro, left = t
+            if left == 0:
+                cmds.append('end(%s)' % name)
+                running.remove(t)
+                continue
+            t[2] -= 1
+            x = keys.draw()
+            if not ro and rnd.random() < write_ratio:
+                cmds.append('W(%s, x%d, %d)' % (name, x, rnd.randint(0, 9999)))
+            else:
+                cmds.append('R(%s, x%d)' % (name, x))
+        for k in [k for k, at in failed.iteritems() if at <= line]:
+            del failed[k]
+            cmds.append('recover(%d)' % k)
+        if fail_rate and rnd.random() < fail_rate and len(failed) < sites - 1:
+            k = rnd.choice([k for k in xrange(1, sites + 1) if k not in failed])
+            failed[k] = line + recover_after
+            cmds.append('fail(%d)' % k)
+        yield '; '.join(cmds)
+
+
+def add_arguments(arg_parser):
+    """
+    Add the options of generate to an argument parser
+    """
+    arg_parser.add_argument('-t', '--transactions', type=int, default=1000,
+        help='number of transactions (1000)')
+    arg_parser.add_argument('--concurrency', type=int, default=10,
+        help='transactions running at the same time (10)')
+    arg_parser.add_argument('--operations', type=int, default=5,
+        help='reads and writes per transaction (5)')
+    arg_parser.add_argument('--write-ratio', type=float, default=0.3,
+        help='share of writes in read/write transactions (0.3)')
+    arg_parser.add_argument('--read-only', type=float, default=0.1,
+        help='share of read-only transactions (0.1)')
+    arg_parser.add_argument('--skew', type=float, default=0.0,
+        help='Zipf exponent of the variable popularity, 0 is uniform (0)')
+    arg_parser.add_argument('--fail-rate', type=float, default=0.0,
+        help='probability that a site fails on a line (0)')
+    arg_parser.add_argument('--recover-after', type=int, default=10,
+        help='lines until a failed site recovers (10)')
+    arg_parser.add_argument('--items', type=int, default=20,
+        help='number of variables (20)')
+    arg_parser.add_argument('--sites', type=int, default=10,
+        help='number of sites (10)')
+    arg_parser.add_argument('--seed', type=int, default=0)
+
+
+def options(args):
+    """
+    :return: keyword arguments of generate from parsed arguments
+    """
+    return dict(transactions=args.transactions, concurrency=args.concurrency,
+        operations=args.operations, write_ratio=args.write_ratio, read_only=args.read_only,
+        skew=args.skew, fail_rate=args.fail_rate, recover_after=args.recover_after,
+        items=args.items, sites=args.sites, seed=args.seed)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='write a generated script')
+    add_arguments(arg_parser)
+    arg_parser.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout,
+        help='file to write (standard output)')
+    args = arg_parser.parse_args()
+    for line in generate(**options(args)):
+        print(line, file=args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# -----------------------------------------------------------------------------
+# batch.py
+#
+# Compile whole adb scripts into compact per-tick instructions
+# -----------------------------------------------------------------------------
+
+import os
+import re
+import hashlib
+import cPickle as pickle
+from array import array
+from version_store import INT64
+import scanner
+
+# opcodes
+BEGIN = 1
+BEGIN_READONLY = 2
+READ = 3
+WRITE = 4
+END = 5
+FAIL = 6
+RECOVER = 7
+DUMP = 8
+QUIT = 9
+RAW = 10
+STATS = 11
+
+FORMAT_VERSION = 2
+
+_item = re.compile(r'x([1-9][0-9]*)$')
+_assignment = re.compile(r'(^|;)\s*[A-Za-z_][A-Za-z0-9_]*\s*=')
+
+
+class Program(object):
+    """
+    A compiled script.
+    Instructions are records of four integers (opcode, transaction id, item id, value),
+    stored back to back in one array. Transaction ids index the names table.
+    Lines that are not simple commands are kept as RAW instructions whose value indexes
+    the raw table, they are handed to the PLY parser when executed.
+    """
+    def __init__(self, digest, names, raw, ops, offsets):
+        """
+        :param digest:  sha1 of the source script
+        :param names:   list of transaction names
+        :param raw:     list of source lines to parse at run time
+        :param ops:     array of instruction records
+        :param offsets: array of tick boundaries, tick i is ops[4*offsets[i]:4*offsets[i+1]]
+        """
+        self.digest = digest
+        self.names = names
+        self.raw = raw
+        self.ops = ops
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __iter__(self):
+        """
+        :return: one list of (opcode, transaction id, item id, value) per tick
+        """
+        ops = self.ops
+        offsets = self.offsets
+        for i in xrange(len(offsets) - 1):
+            yield [tuple(ops[4 * k:4 * k + 4])
+                   for k in xrange(offsets[i], offsets[i + 1])]
+
+    def dump(self, f):
+        pickle.dump((FORMAT_VERSION, self.digest, self.names, self.raw,
+            self.ops.tostring(), self.offsets.tostring()), f, 2)
+
+    @classmethod
+    def load(cls, f):
+        version, digest, names, raw, ops, offsets = pickle.load(f)
+        if version != FORMAT_VERSION:
+            raise ValueError('compiled with format %d' % version)
+        return cls(digest, names, raw,
+            array(INT64, ops), array(INT64, offsets))
+
+
+def compile_lines(lines):
+    """
+    Compile a script, one tick per line
+
+    :param lines:   list of input lines
+    :return:        Program
+    """
+    digest = hashlib.sha1(''.join(lines)).hexdigest()
+    # assignments can rebind any name, so the meaning of a name is only known at run time
+    parse_all = any(_assignment.search(_strip(s)) for s in lines)
+    tids = dict()
+    names = list()
+    raw = list()
+    ops = array(INT64)
+    offsets = array(INT64, [0])
+    for s in lines:
+        code = None if parse_all else _compile_line(s, tids, names)
+        if code is None:
+            code = [(RAW, 0, 0, len(raw))]
+            raw.append(s)
+        for rec in code:
+            ops.extend(rec)
+        offsets.append(offsets[-1] + len(code))
+    return Program(digest, names, raw, ops, offsets)
+
+
+def compile_file(path, cache=True):
+    """
+    Compile a script file, reusing the compiled file path + '.adbc' if it is up to date
+
+    :param path:    path of the script
+    :param cache:   read and write the compiled file
+    :return:        Program
+    """
+    with open(path, 'rU') as f:
+        lines = f.readlines()
+    digest = hashlib.sha1(''.join(lines)).hexdigest()
+    cache_path = path + '.adbc'
+    if cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                program = Program.load(f)
+            if program.digest == digest:
+                return program
+        except (ValueError, EOFError, pickle.UnpicklingError):
+            pass
+    program = compile_lines(lines)
+    if cache:
+        try:
+            with open(cache_path, 'wb') as f:
+                program.dump(f)
+        except IOError:
+            pass
+    return program
+
+
+def _strip(s):
+    i = s.find('//')
+    return s if i < 0 else s[:i]
+
+
+def _compile_line(s, tids, names):
+    """
+    :return: list of instructions, or None if the line is not made of simple commands only
+    """
+    statements = scanner.scan(s)
+    if statements is None:
+        return None
+    code = list()
+    for keyword, args in statements:
+        rec = _compile_statement(keyword, args, tids, names)
+        if rec is None:
+            return None
+        code.extend(rec)
+    return code
+
+
+def _compile_statement(keyword, args, tids, names):
+    if keyword == 'quit':
+        return [(QUIT, 0, 0, 0)]
+    if keyword == 'stats':
+        return [(STATS, 0, 0, 0)]
+    if keyword in ('begin', 'beginro', 'end'):
+        if not all(map(_is_transaction, args)):
+            return None
+        op = {'begin': BEGIN, 'beginro': BEGIN_READONLY, 'end': END}[keyword]
+        return [(op, _tid(a, tids, names), 0, 0) for a in args]
+    if keyword in ('fail', 'recover'):
+        if not all(_fits(a) for a in args):
+            return None
+        op = FAIL if keyword == 'fail' else RECOVER
+        return [(op, 0, 0, a) for a in args]
+    if keyword == 'dump':
+        if not args:
+            return [(DUMP, 0, 0, 0)]
+        if _is_item(args[0]):
+            return [(DUMP, 0, _item_id(args[0]), 0)]
+        if not isinstance(args[0], str) and 0 < args[0] < 2 ** 63:
+            return [(DUMP, 0, 0, args[0])]
+        return None
+    if keyword == 'r':
+        if not _is_transaction(args[0]) or not _is_item(args[1]):
+            return None
+        return [(READ, _tid(args[0], tids, names), _item_id(args[1]), 0)]
+    # keyword == 'w'
+    if not _is_transaction(args[0]) or not _is_item(args[1]) or not _fits(args[2]):
+        return None
+    return [(WRITE, _tid(args[0], tids, names), _item_id(args[1]), args[2])]
+
+
+def _is_transaction(a):
+    return _item.match(a) is None
+
+
+def _is_item(a):
+    return isinstance(a, str) and _item.match(a) is not None and _fits(_item_id(a))
+
+
+def _fits(val):
+    return -2 ** 63 <= val < 2 ** 63
+
+
+def _tid(name, tids, names):
+    if name not in tids:
+        tids[name] = len(names)
+        names.append(name)
+    return tids[name]
+
+
+def _item_id(a):
+    return int(_item.match(a).group(1))
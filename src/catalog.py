@@ -0,0 +1,166 @@
+# -----------------------------------------------------------------------------
+# catalog.py
+#
+# Classes for the catalog of data items and their placement on sites
+# -----------------------------------------------------------------------------
+
+import re
+import json
+from collections import defaultdict
+from data_item import DataItem
+
+# time stamp of the initial versions
+INITIAL_TIMESTAMP = 0
+
+
+def default_placement(i, num_items, num_sites, replication):
+    """
+    Odd indexed variables are at site 1 + index mod number of sites,
+    even indexed ones are at all sites
+    """
+    if i % 2 == 1:
+        return [i % num_sites]
+    return range(num_sites)
+
+
+def hash_placement(i, num_items, num_sites, replication):
+    """
+    Variables are scattered by a multiplicative hash of the index,
+    replicas are on the following sites
+    """
+    start = ((i * 2654435761) & 0xffffffff) % num_sites
+    return [(start + j) % num_sites for j in xrange(replication)]
+
+
+def range_placement(i, num_items, num_sites, replication):
+    """
+    Consecutive variables are at the same site, each site holds about
+    num_items / num_sites of them, replicas are on the following sites
+    """
+    start = (i - 1) * num_sites // num_items
+    return [(start + j) % num_sites for j in xrange(replication)]
+
+
+PLACEMENTS = {
+    'default': default_placement,
+    'hash': hash_placement,
+    'range': range_placement,
+}
+
+
+class Catalog(object):
+    """
+    Catalog configuration: how many variables and sites exist, and where each variable is stored.
+    Variables are named x1 ... xN, sites are numbered 1 ... M.
+    """
+    def __init__(self, items=20, sites=10, placement='default', replication=None,
+            lazy=True):
+        """
+        :param items:       number of variables
+        :param sites:       number of sites
+        :param placement:   name of the placement strategy, one of PLACEMENTS
+        :param replication: number of copies per variable for hash and range placement
+        :param lazy:        create variables on first access instead of all at once
+        """
+        if placement not in PLACEMENTS:
+            raise ValueError('unknown placement %s' % placement)
+        if placement == 'default' and replication is not None:
+            raise ValueError('replication does not apply to default placement')
+        if items < 1 or sites < 1:
+            raise ValueError('need at least one variable and one site')
+        if replication is not None and not 1 <= replication <= sites:
+            raise ValueError('replication must be between 1 and the number of sites')
+        self.items = items
+        self.sites = sites
+        self.placement = placement
+        self.replication = replication or 1
+        self.lazy = lazy
+        self._place = PLACEMENTS[placement]
+
+    @classmethod
+    def from_file(cls, f, **overrides):
+        """
+        Read a catalog configuration from a JSON object with the keys
+        items, sites, placement, replication and lazy
+
+        :param f:           file object to read
+        :param overrides:   values that take precedence over the file, None is ignored
+        """
+        config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError('catalog configuration must be a JSON object')
+        config.update((k, v) for k, v in overrides.iteritems() if v is not None)
+        return cls(**config)
+
+    def site_ids(self, i):
+        """
+        :param i:   variable index
+        :return:    list of indexes into the site list of the transaction manager
+        """
+        return self._place(i, self.items, self.sites, self.replication)
+
+    def build(self, tm):
+        """
+        Create the namespace of data items, see Namespace
+
+        :param tm:  the global transaction manager, with self.sites sites
+        :return:    dictionary from variable name to data item
+        """
+        assert len(tm.sites) == self.sites
+        names = Namespace(self, tm)
+        if not self.lazy:
+            names.materialize()
+        return names
+
+
+class Namespace(dict):
+    """
+    Dictionary of names, variables of the catalog are created on first access.
+    Each site gets the initial version 10i of a variable xi at time 0, so a variable created
+    late looks the same as if it had been there from the start. This holds for a run restored
+    from logs too, its clock continues the one of the run that started at 0, and a copy
+    that was stale after a recovery stays stale.
+    """
+    def __init__(self, catalog, tm):
+        """
+        :param catalog: the catalog configuration
+        :param tm:      the global transaction manager
+        """
+        dict.__init__(self)
+        self.catalog = catalog
+        self._tm = tm
+
+    def __contains__(self, name):
+        return dict.__contains__(self, name) or self._index(name) is not None
+
+    def __missing__(self, name):
+        i = self._index(name)
+        if i is None:
+            raise KeyError(name)
+        x = self[name] = DataItem(self._tm, name, self.catalog.site_ids(i))
+        for s in x.sites:
+            s.load([(i, i * 10)], INITIAL_TIMESTAMP, len(x.sites) > 1)
+        return x
+
+    def materialize(self):
+        """
+        Create all variables that were not accessed yet, one bulk load per site
+        for the replicated ones and one for the others
+        """
+        loads = defaultdict(list)
+        for i in xrange(1, self.catalog.items + 1):
+            name = 'x%d' % i
+            if dict.__contains__(self, name):
+                continue
+            x = self[name] = DataItem(self._tm, name, self.catalog.site_ids(i))
+            for s in x.sites:
+                loads[s, len(x.sites) > 1].append((i, i * 10))
+        for (s, replicated), pairs in loads.iteritems():
+            s.load(pairs, INITIAL_TIMESTAMP, replicated)
+
+    def _index(self, name):
+        match = re.match(r'x([1-9]\d*)$', name)
+        if match is None:
+            return None
+        i = int(match.group(1))
+        return i if i <= self.catalog.items else None
@@ -10,24 +10,22 @@ import re
 
 class DataItem(object):
     """
-    DataItem is used to indicate the 20 variables.
-    Odd indexed variables are stored at site (1+index)%10, Even indexed ones are stored at all sites.
-    All data items should be initialized in adb.py
+    DataItem is used to indicate the variables.
+    Where a variable is stored is decided by the placement of the catalog.
+    All data items should be initialized by the catalog
     """
-    def __init__(self, tm, name):
+    def __init__(self, tm, name, site_ids):
         """
         Create one data item
         Maintain a list of all sites where this data item reside
+        Its initial value is loaded into the sites by the catalog
 
-        :param tm:      the global transaction manager
-        :param name:    string in the format of x1 ... x20
+        :param tm:          the global transaction manager
+        :param name:        string in the format of x1 ... xN, the number is the item id
+        :param site_ids:    indexes into the site list of the transaction manager
         """
         match = re.match(r'x(\d+)$', name)
         assert match is not None
-        num = int(match.group(1))
-        site_ids = [num % 10] if num % 2 == 1 else range(10)
+        self.id = int(match.group(1))
         self.name = name
-        self.sites = map(lambda i: tm.sites[i], site_ids)
-        # initialization
-        map(lambda s: s.write(None, self, num * 10), self.sites)
-        map(lambda s: s.commit(None), self.sites)
+        self.sites = [tm.sites[i] for i in site_ids]
@@ -0,0 +1,344 @@
+# -----------------------------------------------------------------------------
+# database.py
+#
+# Class for an embeddable database, the engine behind adb.py
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+import sys
+import copy
+from StringIO import StringIO
+import logging
+from transaction import ReadWriteTransaction, ReadOnlyTransaction, Opcode
+from transaction_manager import TransactionManager
+from data_item import DataItem
+from catalog import Catalog
+import batch
+import scanner
+import grammar
+
+
+class Database(object):
+    """
+    One simulated database: a catalog of data items on sites, a transaction manager, and the
+    namespaces of a script. Instances share no state, so several can run in one process.
+
+    Commands given between two calls of tick belong to the same tick, like the commands of
+    one input line. The clock advances with the first command of a tick, and the queued
+    operations run when tick is called. Transactions and data items are given either by
+    name or as the objects themselves.
+    """
+    def __init__(self, catalog=None, out=None, **options):
+        """
+        :param catalog: catalog configuration, 20 variables on 10 sites by default
+        :param out:     stream to print to, standard output if None
+        :param options: keyword arguments for the transaction manager
+        """
+        if catalog is None:
+            catalog = Catalog()
+        self.catalog = catalog
+        self.out = out
+        self.tm = TransactionManager(sites=catalog.sites, out=out, **options)
+        # namespaces: data items, transactions, and names assigned by scripts
+        self.items = catalog.build(self.tm)
+        self.transactions = dict()
+        self.variables = dict()
+        self._ticking = False
+        # the actions of the PLY parser run on the database of their lexer
+        self.lexer = grammar.lexer.clone()
+        self.lexer.db = self
+        # PLY keeps parse and error recovery state on the parser, a copy shares the tables
+        # but not that state, so instances can parse in different threads
+        self.parser = copy.copy(grammar.parser)
+
+    def begin(self, name):
+        """
+        Begin a read/write transaction
+
+        :return: the transaction
+        """
+        self._start_tick()
+        return self._begin(name, ReadWriteTransaction)
+
+    def begin_readonly(self, name):
+        """
+        Begin a read-only transaction
+
+        :return: the transaction
+        """
+        self._start_tick()
+        return self._begin(name, ReadOnlyTransaction)
+
+    def read(self, trans, x):
+        self._start_tick()
+        self._read(self._resolve(trans), self._resolve(x))
+
+    def write(self, trans, x, val):
+        self._start_tick()
+        self._write(self._resolve(trans), self._resolve(x), val)
+
+    def end(self, trans):
+        self._start_tick()
+        self._end(self._resolve(trans))
+
+    def fail(self, k):
+        """
+        Fail site k now, a script fails sites after the operations of the tick ran
+        """
+        self._site_command('fail', k)
+
+    def recover(self, k):
+        """
+        Recover site k now, a script recovers sites after the operations of the tick ran
+        """
+        self._site_command('recover', k)
+
+    def dump(self, key=None):
+        """
+        Print the committed values of all data items, of one data item, or at one site
+
+        :param key: None, a data item or its name, or a site number
+        """
+        if isinstance(key, str):
+            key = self.lookup(key)
+        buf = []
+        if key is None:
+            self.items.materialize()
+            for x in self.items.itervalues():
+                for s in x.sites:
+                    buf.append((x.name, s.committed_value(x.id), s.idx))
+        elif isinstance(key, DataItem):
+            for s in key.sites:
+                buf.append((key.name, s.committed_value(key.id), s.idx))
+        elif isinstance(key, int):
+            if not self.site_exists(key):
+                return
+            self.items.materialize()
+            s = self.tm.sites[key - 1]
+            for i in s.versions:
+                buf.append(('x%d' % i, s.committed_value(i), key))
+        else:
+            print('Error: not a data item or a site to dump', file=self.out)
+            return
+        self._grouped_dump_print(buf)
+
+    def stats(self, format='json'):
+        """
+        Print the metrics collected so far, see metrics.Metrics
+
+        :param format:  'json' or 'csv'
+        """
+        self.tm.metrics.write(self.out or sys.stdout, format)
+
+    def tick(self, cmd_list=()):
+        """
+        Run the operations given since the last tick, then the commands of cmd_list
+        In durable mode what the commands logged, e.g. a site failure, is flushed with them
+
+        :param cmd_list:    list of (function, arguments), as returned by parse
+        """
+        self._start_tick()
+        self.tm.next_tick()
+        self._ticking = False
+        for f, args in cmd_list:
+            f(*args)
+        if cmd_list and self.tm.durable:
+            self.tm.flush_logs()
+
+    def parse(self, s):
+        """
+        Run the statements of one line, plain commands are recognized by the
+        scanner and only other lines go through the PLY parser
+
+        :param s:   one input line
+        :return:    list of commands to run after the tick
+        """
+        self._start_tick()
+        statements = scanner.scan(s)
+        if statements is None:
+            return self.parser.parse(s, lexer=self.lexer)
+        cmd_list = []
+        for keyword, args in statements:
+            if keyword == 'begin':
+                for name in args:
+                    self._begin(name, ReadWriteTransaction)
+            elif keyword == 'beginro':
+                for name in args:
+                    self._begin(name, ReadOnlyTransaction)
+            elif keyword == 'stats':
+                cmd_list.append((self.stats, ()))
+            elif keyword == 'quit':
+                raise SystemExit
+            else:
+                args = [self.lookup(a) if isinstance(a, str) else a for a in args]
+                if keyword == 'end':
+                    for trans in args:
+                        self._end(trans)
+                elif keyword == 'r':
+                    self._read(*args)
+                elif keyword == 'w':
+                    self._write(*args)
+                elif keyword == 'dump':
+                    cmd_list.append((self.dump, tuple(args)))
+                else:
+                    cmd_list.extend(self.site_commands(keyword, args))
+        return cmd_list
+
+    def run(self, lines):
+        """
+        Run each line as one tick, a quit raises SystemExit
+
+        :param lines:   iterable of input lines
+        """
+        for s in lines:
+            self.tick(self.parse(s))
+
+    def execute(self, program):
+        """
+        Run a compiled script, with the same effects as running its lines
+
+        :param program: batch.Program
+        """
+        trans = [None] * len(program.names)
+        for code in program:
+            self._start_tick()
+            cmd_list = []
+            for op, tid, item, val in code:
+                if op == batch.RAW:
+                    cmd_list.extend(self.parse(program.raw[val]))
+                elif op == batch.BEGIN:
+                    trans[tid] = self._begin(program.names[tid], ReadWriteTransaction)
+                elif op == batch.BEGIN_READONLY:
+                    trans[tid] = self._begin(program.names[tid], ReadOnlyTransaction)
+                elif op == batch.FAIL:
+                    cmd_list.extend(self.site_commands('fail', [val]))
+                elif op == batch.RECOVER:
+                    cmd_list.extend(self.site_commands('recover', [val]))
+                elif op == batch.DUMP:
+                    key = self.lookup('x%d' % item) if item else (val or None)
+                    cmd_list.append((self.dump, () if key is None else (key, )))
+                elif op == batch.STATS:
+                    cmd_list.append((self.stats, ()))
+                elif op == batch.QUIT:
+                    raise SystemExit
+                else:
+                    t = trans[tid]
+                    if t is None:
+                        # begun by a parsed line
+                        t = trans[tid] = self.lookup(program.names[tid])
+                    if op == batch.END:
+                        self._end(t)
+                    elif op == batch.READ:
+                        self._read(t, self.lookup('x%d' % item))
+                    else:
+                        self._write(t, self.lookup('x%d' % item), val)
+            self.tick(cmd_list)
+
+    def lookup(self, name):
+        """
+        Evaluate a name like the parser does, undefined names are 0
+        Assigned names come first, then transactions, then data items
+        """
+        if name in self.variables:
+            return self.variables[name]
+        if name in self.transactions:
+            return self.transactions[name]
+        try:
+            return self.items[name]
+        except LookupError:
+            print("Undefined name '%s'" % name, file=self.out)
+            return 0
+
+    def site_commands(self, command, vals):
+        """
+        :param command: 'fail' or 'recover'
+        :param vals:    site numbers
+        :return:        list of commands to run after the tick, for sites that exist
+        """
+        cmd_list = []
+        for val in vals:
+            if self.site_exists(val):
+                cmd_list.append((getattr(self.tm.sites[val - 1], command), ()))
+        return cmd_list
+
+    def site_exists(self, val):
+        if isinstance(val, int) and 1 <= val <= len(self.tm.sites):
+            return True
+        print('Error: there is no site %s' % str(val), file=self.out)
+        return False
+
+    def _begin(self, name, cls):
+        # a transaction name must not shadow any other name, as when they shared one namespace
+        taken = (name in self.variables or name in self.transactions or
+            name in self.items)
+        if taken:
+            print('Error: transaction %s has started!!!' % name, file=self.out)
+        assert not taken
+        t = self.transactions[name] = cls(self.tm, name)
+        self.tm.new_transaction(t)
+        logging.debug('command received: %s %s',
+            'begin' if cls is ReadWriteTransaction else 'beginRO', name)
+        return t
+
+    def _read(self, trans, x):
+        trans.append_operation(Opcode.read, x)
+        logging.debug('command received: read %s (transaction %s)',
+            x.name, trans.name)
+
+    def _write(self, trans, x, val):
+        trans.append_operation(Opcode.write, x, val)
+        logging.debug('command received: writing %d to %s (transaction %s)',
+            val, x.name, trans.name)
+
+    def _end(self, trans):
+        trans.append_operation(Opcode.commit)
+        logging.debug('command received: end %s', trans.name)
+
+    def _site_command(self, command, k):
+        self._start_tick()
+        for f, args in self.site_commands(command, [k]):
+            f(*args)
+        if self.tm.durable:
+            self.tm.flush_logs()
+
+    def _resolve(self, key):
+        return self.lookup(key) if isinstance(key, str) else key
+
+    def _start_tick(self):
+        """
+        Advance the clock once per tick, before its first command
+        """
+        if not self._ticking:
+            self._ticking = True
+            self.tm.sleep()
+
+    def _grouped_dump_print(self, lines):
+        print('=' * 80, file=self.out)
+        xasc = sorted(lines)
+        i, j = 0, 0
+        while i < len(xasc):
+            while (j < len(xasc) and xasc[i][:-1] == xasc[j][:-1] and
+                xasc[i][-1] - xasc[j][-1] == i - j):
+                j += 1
+            print('%s: %s at site %s' % (
+                xasc[i][0], str(xasc[i][1]),
+                str(xasc[i][-1]) if i + 1 == j else '%d-%d' % (
+                    xasc[i][-1], xasc[j - 1][-1])), file=self.out)
+            i = j
+
+
+def run_script(lines, **options):
+    """
+    Run a script on a new database and return what it printed, a quit ends the script
+
+    :param lines:   iterable of input lines
+    :param options: keyword arguments of Database
+    :return:        the output of the script
+    """
+    out = StringIO()
+    db = Database(out=out, **options)
+    try:
+        db.run(lines)
+    except SystemExit:
+        pass
+    return out.getvalue()
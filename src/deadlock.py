@@ -0,0 +1,152 @@
+# -----------------------------------------------------------------------------
+# deadlock.py
+#
+# Classes for deadlock detection
+# -----------------------------------------------------------------------------
+
+from collections import OrderedDict
+import transaction
+
+
+class WaitForGraph(object):
+    """
+    Incremental wait-for graph among read/write transactions.
+    Edges are stored in the wait_for and waited_by sets of transactions, and are only
+    changed through this object. A new cycle must go through a transaction that got
+    new edges, so detection only searches the part of the graph reachable from those
+    transactions instead of all blocked transactions.
+    """
+    def __init__(self, age, detect=True):
+        """
+        Create an empty set of transactions whose edges changed since the last detection
+
+        :param age:     key function, a larger key means a younger transaction
+        :param detect:  False if cycles are prevented by a lock policy, changes are not tracked then
+        """
+        self.age = age
+        self.detect_cycles = detect
+        self._dirty = OrderedDict()
+
+    def add_edges(self, t, blockers):
+        """
+        Transaction t starts waiting for all transactions in blockers
+
+        :param t:           the waiting transaction
+        :param blockers:    transactions that t waits for
+        """
+        t.wait_for.update(blockers)
+        for b in blockers:
+            b.waited_by.add(t)
+        if self.detect_cycles:
+            self._dirty[t] = None
+
+    def remove(self, t):
+        """
+        Remove a committed or aborted transaction and all its edges
+
+        :param t:   the finished transaction
+        :return:    list of transactions that were waiting for t
+        """
+        for b in t.wait_for:
+            b.waited_by.discard(t)
+        waiters = list(t.waited_by)
+        for w in waiters:
+            w.wait_for.discard(t)
+        t.wait_for.clear()
+        t.waited_by.clear()
+        self._dirty.pop(t, None)
+        return waiters
+
+    def detect(self):
+        """
+        Find cycles created since the last call.
+        The youngest transaction of every strongly connected component is chosen
+        as a victim, and the rest of the component is searched again until no
+        cycle is left.
+
+        :return:    list of victims, youngest first
+        """
+        roots = [t for t in self._dirty if t.status == transaction.Status.blocked]
+        self._dirty.clear()
+        if not roots:
+            return []
+        victims = list()
+        sccs = self._cyclic(self._sccs(self._reachable(roots)))
+        while sccs:
+            remaining = list()
+            for scc in sccs:
+                victim = max(scc, key=self.age)
+                victims.append(victim)
+                scc.remove(victim)
+                remaining.extend(self._cyclic(self._sccs(set(scc))))
+            sccs = remaining
+        victims.sort(key=self.age, reverse=True)
+        return victims
+
+    @staticmethod
+    def _cyclic(sccs):
+        return [scc for scc in sccs if len(scc) >= 2]
+
+    @staticmethod
+    def _reachable(roots):
+        """
+        :return: set of blocked transactions reachable from roots through wait_for edges
+        """
+        seen = set(roots)
+        stack = list(roots)
+        while stack:
+            v = stack.pop()
+            for w in v.wait_for:
+                if w not in seen and w.status == transaction.Status.blocked:
+                    seen.add(w)
+                    stack.append(w)
+        return seen
+
+    @staticmethod
+    def _sccs(nodes):
+        """
+        Iterative Tarjan's algorithm restricted to the given set of transactions
+
+        :return: list of strongly connected components, each one is a list
+        """
+        index = dict()
+        low = dict()
+        stack = list()
+        on_stack = set()
+        res = list()
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(root.wait_for))]
+            while work:
+                v, edges = work[-1]
+                for w in edges:
+                    if w not in nodes:
+                        continue
+                    if w not in index:
+                        index[w] = low[w] = len(index)
+                        stack.append(w)
+                        on_stack.add(w)
+                        work.append((w, iter(w.wait_for)))
+                        break
+                    elif w in on_stack:
+                        low[v] = min(low[v], index[w])
+                else:
+                    # all edges of v are visited
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        low[u] = min(low[u], low[v])
+                    if low[v] == index[v]:
+                        scc = list()
+                        while True:
+                            w = stack.pop()
+                            on_stack.discard(w)
+                            scc.append(w)
+                            if w is v:
+                                break
+                        res.append(scc)
+        return res
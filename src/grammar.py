@@ -0,0 +1,246 @@
+# -----------------------------------------------------------------------------
+# http://www.dabeaz.com/ply/example.html
+# grammar.py
+#
+# Lexer and parser of the adb language
+# The actions run the statements on the database of the lexer, see Database.parse
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+
+reserved = {
+    'begin': 'BEGIN',
+    'beginro': 'BEGIN_READONLY',
+    'end': 'END',
+    'dump': 'DUMP',
+    'fail': 'FAIL',
+    'recover': 'RECOVER',
+    'r': 'READ',
+    'w': 'WRITE',
+    'quit': 'QUIT',
+    'stats': 'STATS',
+}
+
+tokens = [
+    'NAME', 'NUMBER',
+    'PLUS', 'MINUS', 'TIMES', 'DIVIDE', 'EQUALS',
+    'LPAREN', 'RPAREN',
+    'COMMA', 'SEMICOLON',
+] + list(reserved.values())
+
+# Tokens
+
+t_PLUS = r'\+'
+t_MINUS = r'-'
+t_TIMES = r'\*'
+t_DIVIDE = r'/'
+t_EQUALS = r'='
+t_LPAREN = r'\('
+t_RPAREN = r'\)'
+t_COMMA = r','
+t_SEMICOLON = r';'
+
+
+def t_NAME(t):
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value.lower(), 'NAME')
+    return t
+
+
+def t_NUMBER(t):
+    r'\d+'
+    try:
+        t.value = int(t.value)
+    except ValueError:
+        print("Integer value too large %d", t.value, file=t.lexer.db.out)
+        t.value = 0
+    return t
+
+
+# Ignored characters
+t_ignore = " \t"
+
+
+def t_COMMENT(t):
+    r'//.*'
+    pass  # No return value. Token discarded
+
+
+def t_newline(t):
+    r'\n+'
+    t.lexer.lineno += t.value.count("\n")
+
+
+def t_error(t):
+    print("Illegal character '%s'" % t.value[0], file=t.lexer.db.out)
+    t.lexer.skip(1)
+
+
+# Build the lexer
+import ply.lex as lex
+
+lexer = lex.lex()
+
+# Parsing rules
+
+precedence = (
+    ('left', 'PLUS', 'MINUS'),
+    ('left', 'TIMES', 'DIVIDE'),
+    ('right', 'UMINUS'),
+)
+
+
+def p_stmtlist_0(t):
+    'stmtlist : '
+    t[0] = []
+
+
+def p_stmtlist_1(t):
+    'stmtlist : statement'
+    if t[1] is not None:
+        t[0] = t[1]
+    else:
+        t[0] = []
+
+
+def p_stmtlist_2(t):
+    'stmtlist : statement SEMICOLON stmtlist'
+    if t[1] is not None:
+        t[0] = t[1] + t[3]
+    else:
+        t[0] = t[3]
+
+
+def p_statement_quit(t):
+    'statement : QUIT'
+    raise SystemExit
+
+
+def p_statement_begin_transaction(t):
+    'statement : BEGIN LPAREN namelist RPAREN'
+    db = t.lexer.db
+    for name in t[3]:
+        db.begin(name)
+
+
+def p_statement_begin_readonly_transaction(t):
+    'statement : BEGIN_READONLY LPAREN namelist RPAREN'
+    db = t.lexer.db
+    for name in t[3]:
+        db.begin_readonly(name)
+
+
+def p_statement_end_transaction(t):
+    'statement : END LPAREN exprlist RPAREN'
+    db = t.lexer.db
+    for trans in t[3]:
+        db.end(trans)
+
+
+def p_statement_fail(t):
+    'statement : FAIL LPAREN exprlist RPAREN'
+    t[0] = t.lexer.db.site_commands('fail', t[3])
+
+
+def p_statement_recover(t):
+    'statement : RECOVER LPAREN exprlist RPAREN'
+    t[0] = t.lexer.db.site_commands('recover', t[3])
+
+
+def p_statement_read(t):
+    'statement : READ LPAREN expression COMMA expression RPAREN'
+    t.lexer.db.read(t[3], t[5])
+
+
+def p_statement_write(t):
+    'statement : WRITE LPAREN expression COMMA expression COMMA expression RPAREN'
+    t.lexer.db.write(t[3], t[5], t[7])
+
+
+def p_statement_dump(t):
+    'statement : DUMP LPAREN RPAREN'
+    t[0] = [(t.lexer.db.dump, ())]
+
+
+def p_statement_dump_spec(t):
+    'statement : DUMP LPAREN expression RPAREN'
+    t[0] = [(t.lexer.db.dump, (t[3], ))]
+
+
+def p_statement_stats(t):
+    'statement : STATS LPAREN RPAREN'
+    t[0] = [(t.lexer.db.stats, ())]
+
+
+def p_statement_assign(t):
+    'statement : NAME EQUALS expression'
+    t.lexer.db.variables[t[1]] = t[3]
+
+
+def p_statement_expr(t):
+    'statement : expression'
+    print(t[1], file=t.lexer.db.out)
+
+
+def p_namelist_1(t):
+    'namelist : NAME'
+    t[0] = [t[1]]
+
+
+def p_namelist_2(t):
+    'namelist : NAME COMMA namelist'
+    t[0] = [t[1]] + t[3]
+
+
+def p_exprlist_1(t):
+    'exprlist : expression'
+    t[0] = [t[1]]
+
+
+def p_exprlist_2(t):
+    'exprlist : expression COMMA exprlist'
+    t[0] = [t[1]] + t[3]
+
+
+def p_expression_binop(t):
+    '''expression : expression PLUS expression
+                  | expression MINUS expression
+                  | expression TIMES expression
+                  | expression DIVIDE expression'''
+    if t[2] == '+':
+        t[0] = t[1] + t[3]
+    elif t[2] == '-':
+        t[0] = t[1] - t[3]
+    elif t[2] == '*':
+        t[0] = t[1] * t[3]
+    elif t[2] == '/':
+        t[0] = t[1] / t[3]
+
+
+def p_expression_uminus(t):
+    'expression : MINUS expression %prec UMINUS'
+    t[0] = -t[2]
+
+
+def p_expression_group(t):
+    'expression : LPAREN expression RPAREN'
+    t[0] = t[2]
+
+
+def p_expression_number(t):
+    'expression : NUMBER'
+    t[0] = t[1]
+
+
+def p_expression_name(t):
+    'expression : NAME'
+    t[0] = t.lexer.db.lookup(t[1])
+
+
+def p_error(t):
+    print("Syntax error at '%s'" % t.value, file=t.lexer.db.out)
+
+
+import ply.yacc as yacc
+
+parser = yacc.yacc()
@@ -15,14 +15,36 @@ class Mode(Enum):
     write = 2
 
 
+class Policy(Enum):
+    """
+    How a lock conflict is resolved
+    detect:     always wait, cycles are broken by deadlock detection
+    wait_die:   wait only for younger transactions, otherwise abort the requester
+    wound_wait: wait, and abort (wound) younger transactions that are waited for
+    no_wait:    abort the requester at once
+    """
+    detect = 1
+    wait_die = 2
+    wound_wait = 3
+    no_wait = 4
+
+
+# enum members are looked up through the metaclass on every access, acquire runs often enough
+# to use plain module names for the ones it compares against
+READ, WRITE = Mode.read, Mode.write
+WAIT_DIE, NO_WAIT = Policy.wait_die, Policy.no_wait
+
+
 class LockBase(object):
     """
     Abstract class for lock
     """
+    __slots__ = ()
+
     def __init__(self):
         pass
 
-    def acquire(self, t, mode):
+    def acquire(self, t, mode, policy=Policy.detect):
         pass
 
     def release(self, t):
@@ -36,7 +58,12 @@ class FIFOLock(LockBase):
     Read locks are not exclusive, but write lock is
     Lock type is specified as mode (read/write) when acquiring the lock
     Lock object is maintaining by site, there should only one lock per data item
+    The tick each waiter started queuing is kept in since, to time lock waits
+    A transaction that ends takes itself out of the queues it waits in, see dequeue,
+    finished waiters that are still found at the head are dropped when the lock is used
     """
+    __slots__ = ('mode', 'holders', 'queuing', 'since')
+
     def __init__(self):
         """
         Create a new lock for the data item
@@ -48,15 +75,21 @@ class FIFOLock(LockBase):
         self.mode = None
         self.holders = set()
         self.queuing = deque()
+        self.since = dict()
 
-    def acquire(self, t, mode):
+    def acquire(self, t, mode, policy=Policy.detect, now=0):
         """
         Try to acquire the lock
         Following the rules that read locks are not exclusive, and FIFO.
+        On conflict, the policy decides whether t waits or has to abort. Age is compared
+        by creation timestamp, wounding younger transactions is left to the transaction manager.
 
         :param t:       The transaction trying to acquire this lock
         :param mode:    type of lock to acquire, read or write
-        :return:        True if success, the set of transactions to wait for if not success
+        :param policy:  deadlock prevention policy
+        :param now:     current tick, recorded in since if t starts queuing
+        :return:        True if success, the set of transactions to wait for if not success,
+                        False if t should abort instead of waiting
         """
         self._maintain_queue()
         if t in self.holders:
@@ -64,27 +97,27 @@ class FIFOLock(LockBase):
                 # already acquired!
                 return True
             # try to upgrade the lock
-            if self.mode is Mode.read and mode is Mode.write:
+            if self.mode is READ and mode is WRITE:
                 # the only holder? upgrade in any case, otherwise strange deadlock?
                 # t is the first one queuing?
                 if len(self.holders) == 1:
                     if self.queuing and t is self.queuing[0]:
-                        self.queuing.popleft()
+                        self._dequeue()
                     self.mode = mode
                     return True
             # has a higher priority, do not queue
             logging.debug(
-                'transaction %s cannot upgrade its lock, waiting' % t.name)
-            ret = self.holders
+                'transaction %s cannot upgrade its lock, waiting', t.name)
+            ret = set(self.holders)
         else:
             # R/R
-            if self.mode is Mode.read and mode is Mode.read:
+            if self.mode is READ and mode is READ:
                 # someone queuing? t is not the first one?
                 if not self.queuing:
                     self.holders.add(t)
                     return True
                 elif t is self.queuing[0]:
-                    self.queuing.popleft()
+                    self._dequeue()
                     self.holders.add(t)
                     return True
             # no lock holders
@@ -96,23 +129,44 @@ class FIFOLock(LockBase):
                     self.holders.add(t)
                     return True
                 elif t is self.queuing[0]:
-                    self.queuing.popleft()
+                    self._dequeue()
                     self.mode = mode
                     self.holders.add(t)
                     return True
-            # enqueue
-            logging.debug(
-                'transaction %s cannot get a new lock, queuing' % t.name)
-            assert t not in self.queuing
-            # acquired failed
-            # queue the transaction
-            self.queuing.append(t)
-            ret = self.holders | set(self.queuing)
-        # return set of transactions to wait for
+            # t waits for the holders and everyone queuing before it
+            ret = set(self.holders)
+            if t in self.since:
+                # still queuing from an earlier attempt, e.g. a write that was blocked at
+                # another site first when it was retried
+                logging.debug(
+                    'transaction %s cannot get a new lock, still queuing', t.name)
+                for u in self.queuing:
+                    if u is t:
+                        break
+                    ret.add(u)
+            else:
+                # enqueue
+                logging.debug(
+                    'transaction %s cannot get a new lock, queuing', t.name)
+                # acquired failed
+                # queue the transaction
+                ret.update(self.queuing)
+                self.queuing.append(t)
+                self.since[t] = now
+        # return set of transactions to wait for, a new set owned by the caller
         # fix bug when this set has transaction itself
-        ret = ret.copy()
         ret.discard(t)
         assert len(ret) > 0
+        if policy is NO_WAIT or (
+                policy is WAIT_DIE and
+                any(b.priority <= t.priority for b in ret)):
+            logging.debug(
+                'transaction %s dies instead of waiting (%s)',
+                t.name, policy.name)
+            if self.queuing and self.queuing[-1] is t:
+                self.queuing.pop()
+                del self.since[t]
+            return False
         return ret
 
     def release(self, t):
@@ -127,13 +181,41 @@ class FIFOLock(LockBase):
         if not self.holders:
             self.mode = None
 
+    def dequeue(self, t):
+        """
+        Take a transaction out of the queue, wherever it is
+        Called when t ends or its operation went on without this lock, so it does not
+        block the waiters behind it or become a blocker of new ones
+
+        :param t:   the transaction to remove, nothing happens if it is not queuing
+        """
+        if t in self.since:
+            self.queuing.remove(t)
+            del self.since[t]
+
+    def idle(self):
+        """
+        Check if the lock can be dropped, finished waiters at the head are removed first
+
+        :return:    True if no transaction holds or waits for this lock
+        """
+        self._maintain_queue()
+        return not self.holders and not self.queuing
+
     def _maintain_queue(self):
-        while self.queuing and self.queuing[0].status is transaction.Status.aborted:
-            self.queuing.popleft()
+        committed, aborted = transaction.Status.committed, transaction.Status.aborted
+        while self.queuing:
+            status = self.queuing[0].status
+            if status is not aborted and status is not committed:
+                break
+            self._dequeue()
+
+    def _dequeue(self):
+        del self.since[self.queuing.popleft()]
 
     def _mode_accept(self, mode):
         if self.mode is mode:
             return True
-        if self.mode is Mode.write:
+        if self.mode is WRITE:
             return True
         return False
@@ -0,0 +1,121 @@
+# -----------------------------------------------------------------------------
+# metrics.py
+#
+# Classes for the timing and contention metrics of a database
+# -----------------------------------------------------------------------------
+
+import csv
+import json
+from collections import defaultdict
+
+# why transactions abort
+DEADLOCK = 'deadlock'       # victim of deadlock detection
+WOUNDED = 'wounded'         # wounded by an older transaction under wound-wait
+DIED = 'died'               # refused to wait under wait-die or no-wait
+VALIDATION = 'validation'   # an accessed site failed before commit
+
+
+class Summary(object):
+    """
+    Count, total and maximum of a series of values
+    """
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        return float(self.total) / self.count if self.count else 0.0
+
+    def to_dict(self):
+        return dict(count=self.count, total=self.total, mean=self.mean, max=self.max)
+
+
+class Metrics(object):
+    """
+    Registry of the metrics of one database, updated by the transaction manager, the sites
+    and their locks
+        tick_seconds        wall time of each tick
+        operations          operations dispatched in each tick
+        blocked             blocked transactions at the end of each tick
+        detection_seconds   wall time of deadlock detection (or killing wounded transactions)
+        lock_waits          ticks from queuing for a lock to getting it, per site and item
+        aborts              number of aborts by reason
+    """
+    def __init__(self):
+        self.tick_seconds = Summary()
+        self.operations = Summary()
+        self.blocked = Summary()
+        self.detection_seconds = Summary()
+        self.lock_waits = defaultdict(Summary)
+        self.aborts = defaultdict(int)
+
+    def tick(self, seconds, operations, blocked):
+        self.tick_seconds.add(seconds)
+        self.operations.add(operations)
+        self.blocked.add(blocked)
+
+    def detection(self, seconds):
+        self.detection_seconds.add(seconds)
+
+    def lock_wait(self, site_id, item_id, ticks):
+        self.lock_waits[site_id, item_id].add(ticks)
+
+    def abort(self, reason):
+        self.aborts[reason] += 1
+
+    def to_dict(self):
+        """
+        :return: the metrics as a dictionary of plain values, lock waits are
+                 listed by site and item
+        """
+        return dict(
+            ticks=self.tick_seconds.count,
+            tick_seconds=self.tick_seconds.to_dict(),
+            operations_per_tick=self.operations.to_dict(),
+            blocked_per_tick=self.blocked.to_dict(),
+            detection_seconds=self.detection_seconds.to_dict(),
+            lock_waits=[dict(site=site_id, item='x%d' % item_id, **s.to_dict())
+                for (site_id, item_id), s in sorted(self.lock_waits.iteritems())],
+            aborts=dict(self.aborts))
+
+    def write_json(self, f):
+        json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+        f.write('\n')
+
+    def write_csv(self, f):
+        """
+        One row per summary with the columns metric, site, item, count, total, mean, max,
+        aborts only have a count
+        """
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['metric', 'site', 'item', 'count', 'total', 'mean', 'max'])
+        for name, s in [('tick_seconds', self.tick_seconds),
+                ('operations_per_tick', self.operations),
+                ('blocked_per_tick', self.blocked),
+                ('detection_seconds', self.detection_seconds)]:
+            writer.writerow([name, '', '', s.count, s.total, s.mean, s.max])
+        for (site_id, item_id), s in sorted(self.lock_waits.iteritems()):
+            writer.writerow(['lock_wait_ticks', site_id, 'x%d' % item_id,
+                s.count, s.total, s.mean, s.max])
+        for reason, n in sorted(self.aborts.iteritems()):
+            writer.writerow(['aborts_' + reason, '', '', n, '', '', ''])
+
+    def write(self, f, format='json'):
+        """
+        :param f:       file to write to
+        :param format:  'json' or 'csv'
+        """
+        if format == 'csv':
+            self.write_csv(f)
+        else:
+            self.write_json(f)
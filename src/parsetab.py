@@ -5,9 +5,9 @@ _tabversion = '3.8'
 
 _lr_method = 'LALR'
 
-_lr_signature = '59653305E61BF9BDF3E860B142AE5EE9'
+_lr_signature = 'F592512C7BFAD8AFF87D2A22A86BEFAD'
     
-_lr_action_items = {'QUIT':([0,23,],[13,13,]),'BEGIN':([0,23,],[7,7,]),'DIVIDE':([3,14,16,20,21,26,35,36,41,43,44,46,48,49,50,51,62,65,68,],[-26,-27,31,-24,-27,31,31,31,31,31,-25,31,31,-23,31,-22,31,31,31,]),'END':([0,23,],[9,9,]),'NAME':([0,6,11,17,18,19,22,23,24,25,27,28,29,30,31,32,33,53,55,57,59,67,],[14,21,21,21,21,38,38,14,21,21,21,21,21,21,21,21,21,21,38,21,21,21,]),'DUMP':([0,23,],[1,1,]),'READ':([0,23,],[2,2,]),'NUMBER':([0,6,11,17,18,23,24,25,27,28,29,30,31,32,33,53,57,59,67,],[3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,]),'BEGIN_READONLY':([0,23,],[4,4,]),'TIMES':([3,14,16,20,21,26,35,36,41,43,44,46,48,49,50,51,62,65,68,],[-26,-27,33,-24,-27,33,33,33,33,33,-25,33,33,-23,33,-22,33,33,33,]),'WRITE':([0,23,],[10,10,]),'COMMA':([3,20,21,36,38,41,43,44,48,49,50,51,65,],[-26,-24,-27,53,55,57,59,-25,-20,-23,-21,-22,67,]),'PLUS':([3,14,16,20,21,26,35,36,41,43,44,46,48,49,50,51,62,65,68,],[-26,-27,30,-24,-27,30,30,30,30,30,-25,30,-20,-23,-21,-22,30,30,30,]),'LPAREN':([0,1,2,4,6,7,9,10,11,12,15,17,18,23,24,25,27,28,29,30,31,32,33,53,57,59,67,],[11,17,18,19,11,22,24,25,11,27,29,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,11,]),'FAIL':([0,23,],[12,12,]),'RPAREN':([3,17,20,21,26,35,37,38,39,41,42,44,45,47,48,49,50,51,62,63,64,68,],[-26,34,-24,-27,44,52,54,-16,56,-18,58,-25,60,61,-20,-23,-21,-22,66,-17,-19,69,]),'EQUALS':([14,],[28,]),'RECOVER':([0,23,],[15,15,]),'MINUS':([0,3,6,11,14,16,17,18,20,21,23,24,25,26,27,28,29,30,31,32,33,35,36,41,43,44,46,48,49,50,51,53,57,59,62,65,67,68,],[6,-26,6,6,-27,32,6,6,-24,-27,6,6,6,32,6,6,6,6,6,6,6,32,32,32,32,-25,32,-20,-23,-21,-22,6,6,6,32,32,6,32,]),'SEMICOLON':([3,8,13,14,16,20,21,34,44,46,48,49,50,51,52,54,56,58,60,61,66,69,],[-26,23,-4,-27,-15,-24,-27,-12,-25,-14,-20,-23,-21,-22,-13,-6,-5,-7,-8,-9,-10,-11,]),'$end':([0,3,5,8,13,14,16,20,21,23,34,40,44,46,48,49,50,51,52,54,56,58,60,61,66,69,],[-1,-26,0,-2,-4,-27,-15,-24,-27,-1,-12,-3,-25,-14,-20,-23,-21,-22,-13,-6,-5,-7,-8,-9,-10,-11,]),}
+_lr_action_items = {'DUMP':([0,25,],[1,1,]),'READ':([0,25,],[2,2,]),'NUMBER':([0,7,12,18,19,21,25,27,29,30,31,32,33,34,35,56,59,62,70,],[3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,3,]),'BEGIN_READONLY':([0,25,],[4,4,]),'STATS':([0,25,],[10,10,]),'MINUS':([0,3,7,12,15,17,18,19,21,22,23,25,27,28,29,30,31,32,33,34,35,37,38,41,46,47,49,51,52,53,54,56,59,62,65,68,70,71,],[7,-27,7,7,-28,34,7,7,7,-25,-28,7,7,34,7,7,7,7,7,7,7,34,34,34,34,-26,34,-21,-24,-22,-23,7,7,7,34,34,7,34,]),'BEGIN':([0,25,],[8,8,]),'RPAREN':([3,18,22,23,26,28,37,39,40,41,42,43,47,48,50,51,52,53,54,65,66,67,71,],[-27,36,-25,-28,45,47,55,57,-17,-19,60,61,-26,63,64,-21,-24,-22,-23,69,-18,-20,72,]),'SEMICOLON':([3,9,14,15,17,22,23,36,45,47,49,51,52,53,54,55,57,60,61,63,64,69,72,],[-27,25,-4,-28,-16,-25,-28,-12,-14,-26,-15,-21,-24,-22,-23,-13,-6,-7,-5,-8,-9,-10,-11,]),'COMMA':([3,22,23,38,40,41,46,47,51,52,53,54,68,],[-27,-25,-28,56,58,59,62,-26,-21,-24,-22,-23,70,]),'PLUS':([3,15,17,22,23,28,37,38,41,46,47,49,51,52,53,54,65,68,71,],[-27,-28,32,-25,-28,32,32,32,32,32,-26,32,-21,-24,-22,-23,32,32,32,]),'$end':([0,3,5,9,14,15,17,22,23,25,36,44,45,47,49,51,52,53,54,55,57,60,61,63,64,69,72,],[-1,-27,0,-2,-4,-28,-16,-25,-28,-1,-12,-3,-14,-26,-15,-21,-24,-22,-23,-13,-6,-7,-5,-8,-9,-10,-11,]),'END':([0,25,],[6,6,]),'DIVIDE':([3,15,17,22,23,28,37,38,41,46,47,49,51,52,53,54,65,68,71,],[-27,-28,33,-25,-28,33,33,33,33,33,-26,33,33,-24,33,-23,33,33,33,]),'EQUALS':([15,],[30,]),'TIMES':([3,15,17,22,23,28,37,38,41,46,47,49,51,52,53,54,65,68,71,],[-27,-28,35,-25,-28,35,35,35,35,35,-26,35,35,-24,35,-23,35,35,35,]),'WRITE':([0,25,],[11,11,]),'LPAREN':([0,1,2,4,6,7,8,10,11,12,13,16,18,19,21,25,27,29,30,31,32,33,34,35,56,59,62,70,],[12,18,19,20,21,12,24,26,27,12,29,31,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,]),'FAIL':([0,25,],[13,13,]),'QUIT':([0,25,],[14,14,]),'NAME':([0,7,12,18,19,20,21,24,25,27,29,30,31,32,33,34,35,56,58,59,62,70,],[15,23,23,23,23,40,23,40,15,23,23,23,23,23,23,23,23,23,40,23,23,23,]),'RECOVER':([0,25,],[16,16,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -16,7 +16,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'namelist':([19,22,55,],[37,39,63,]),'expression':([0,6,11,17,18,23,24,25,27,28,29,30,31,32,33,53,57,59,67,],[16,20,26,35,36,16,41,43,41,46,41,48,49,50,51,62,41,65,68,]),'statement':([0,23,],[8,8,]),'stmtlist':([0,23,],[5,40,]),'exprlist':([24,27,29,57,],[42,45,47,64,]),}
+_lr_goto_items = {'namelist':([20,24,58,],[39,43,66,]),'expression':([0,7,12,18,19,21,25,27,29,30,31,32,33,34,35,56,59,62,70,],[17,22,28,37,38,41,17,46,41,49,41,51,52,53,54,65,41,68,71,]),'statement':([0,25,],[9,9,]),'stmtlist':([0,25,],[5,44,]),'exprlist':([21,29,31,59,],[42,48,50,67,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -26,31 +26,32 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> stmtlist","S'",1,None,None,None),
-  ('stmtlist -> <empty>','stmtlist',0,'p_stmtlist_0','adb.py',104),
-  ('stmtlist -> statement','stmtlist',1,'p_stmtlist_1','adb.py',109),
-  ('stmtlist -> statement SEMICOLON stmtlist','stmtlist',3,'p_stmtlist_2','adb.py',114),
-  ('statement -> QUIT','statement',1,'p_statement_quit','adb.py',119),
-  ('statement -> BEGIN LPAREN namelist RPAREN','statement',4,'p_statement_begin_transaction','adb.py',124),
-  ('statement -> BEGIN_READONLY LPAREN namelist RPAREN','statement',4,'p_statement_begin_readonly_transaction','adb.py',135),
-  ('statement -> END LPAREN exprlist RPAREN','statement',4,'p_statement_end_transaction','adb.py',146),
-  ('statement -> FAIL LPAREN exprlist RPAREN','statement',4,'p_statement_fail','adb.py',153),
-  ('statement -> RECOVER LPAREN exprlist RPAREN','statement',4,'p_statement_recover','adb.py',160),
-  ('statement -> READ LPAREN expression COMMA expression RPAREN','statement',6,'p_statement_read','adb.py',167),
-  ('statement -> WRITE LPAREN expression COMMA expression COMMA expression RPAREN','statement',8,'p_statement_write','adb.py',173),
-  ('statement -> DUMP LPAREN RPAREN','statement',3,'p_statement_dump','adb.py',179),
-  ('statement -> DUMP LPAREN expression RPAREN','statement',4,'p_statement_dump_spec','adb.py',193),
-  ('statement -> NAME EQUALS expression','statement',3,'p_statement_assign','adb.py',212),
-  ('statement -> expression','statement',1,'p_statement_expr','adb.py',217),
-  ('namelist -> NAME','namelist',1,'p_namelist_1','adb.py',222),
-  ('namelist -> NAME COMMA namelist','namelist',3,'p_namelist_2','adb.py',227),
-  ('exprlist -> expression','exprlist',1,'p_exprlist_1','adb.py',232),
-  ('exprlist -> expression COMMA exprlist','exprlist',3,'p_exprlist_2','adb.py',237),
-  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','adb.py',242),
-  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','adb.py',243),
-  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','adb.py',244),
-  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','adb.py',245),
-  ('expression -> MINUS expression','expression',2,'p_expression_uminus','adb.py',257),
-  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','adb.py',262),
-  ('expression -> NUMBER','expression',1,'p_expression_number','adb.py',267),
-  ('expression -> NAME','expression',1,'p_expression_name','adb.py',272),
+  ('stmtlist -> <empty>','stmtlist',0,'p_stmtlist_0','grammar.py',94),
+  ('stmtlist -> statement','stmtlist',1,'p_stmtlist_1','grammar.py',99),
+  ('stmtlist -> statement SEMICOLON stmtlist','stmtlist',3,'p_stmtlist_2','grammar.py',107),
+  ('statement -> QUIT','statement',1,'p_statement_quit','grammar.py',115),
+  ('statement -> BEGIN LPAREN namelist RPAREN','statement',4,'p_statement_begin_transaction','grammar.py',120),
+  ('statement -> BEGIN_READONLY LPAREN namelist RPAREN','statement',4,'p_statement_begin_readonly_transaction','grammar.py',127),
+  ('statement -> END LPAREN exprlist RPAREN','statement',4,'p_statement_end_transaction','grammar.py',134),
+  ('statement -> FAIL LPAREN exprlist RPAREN','statement',4,'p_statement_fail','grammar.py',141),
+  ('statement -> RECOVER LPAREN exprlist RPAREN','statement',4,'p_statement_recover','grammar.py',146),
+  ('statement -> READ LPAREN expression COMMA expression RPAREN','statement',6,'p_statement_read','grammar.py',151),
+  ('statement -> WRITE LPAREN expression COMMA expression COMMA expression RPAREN','statement',8,'p_statement_write','grammar.py',156),
+  ('statement -> DUMP LPAREN RPAREN','statement',3,'p_statement_dump','grammar.py',161),
+  ('statement -> DUMP LPAREN expression RPAREN','statement',4,'p_statement_dump_spec','grammar.py',166),
+  ('statement -> STATS LPAREN RPAREN','statement',3,'p_statement_stats','grammar.py',171),
+  ('statement -> NAME EQUALS expression','statement',3,'p_statement_assign','grammar.py',176),
+  ('statement -> expression','statement',1,'p_statement_expr','grammar.py',181),
+  ('namelist -> NAME','namelist',1,'p_namelist_1','grammar.py',186),
+  ('namelist -> NAME COMMA namelist','namelist',3,'p_namelist_2','grammar.py',191),
+  ('exprlist -> expression','exprlist',1,'p_exprlist_1','grammar.py',196),
+  ('exprlist -> expression COMMA exprlist','exprlist',3,'p_exprlist_2','grammar.py',201),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_binop','grammar.py',206),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_binop','grammar.py',207),
+  ('expression -> expression TIMES expression','expression',3,'p_expression_binop','grammar.py',208),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_binop','grammar.py',209),
+  ('expression -> MINUS expression','expression',2,'p_expression_uminus','grammar.py',221),
+  ('expression -> LPAREN expression RPAREN','expression',3,'p_expression_group','grammar.py',226),
+  ('expression -> NUMBER','expression',1,'p_expression_number','grammar.py',231),
+  ('expression -> NAME','expression',1,'p_expression_name','grammar.py',236),
 ]
@@ -0,0 +1,207 @@
+# -----------------------------------------------------------------------------
+# profiler.py
+#
+# Classes for profiling hot items and lock contention
+# -----------------------------------------------------------------------------
+
+from __future__ import print_function
+from collections import defaultdict
+import transaction
+import site1 as site
+
+
+class LockSamples(object):
+    """
+    What the samples of one lock (an item at a site) add up to
+    """
+    __slots__ = ('ticks', 'contended', 'waiters', 'peak')
+
+    def __init__(self):
+        self.ticks = 0
+        self.contended = 0
+        self.waiters = 0
+        self.peak = 0
+
+    def add(self, depth):
+        self.ticks += 1
+        if depth:
+            self.contended += 1
+            self.waiters += depth
+            if depth > self.peak:
+                self.peak = depth
+
+    @property
+    def mean(self):
+        return float(self.waiters) / self.ticks if self.ticks else 0.0
+
+
+class ContentionProfiler(object):
+    """
+    Samples the lock table of every site at the end of each tick, see TransactionManager.
+    A transaction in the queue of a lock waits for the holders and the transactions queuing
+    before it, the same as FIFOLock.acquire reports, these edges give the wait chains.
+    The report lists the hottest items by waiter ticks (queue length summed over the samples),
+    the longest wait chains seen, the locks with the deepest average queue, and the
+    transactions that blocked others most often.
+    """
+    def __init__(self, top=10):
+        """
+        :param top: number of entries of each list of the report
+        """
+        self.top = top
+        self.samples = 0
+        self.locks = defaultdict(LockSamples)
+        # longest chain seen at each tick, tuple of names -> first tick
+        self.chains = dict()
+        self.blocked_by = defaultdict(int)
+
+    def sample(self, tm):
+        """
+        Take one sample of the lock tables of all running sites
+
+        :param tm:  the transaction manager at the end of a tick
+        """
+        self.samples += 1
+        aborted = transaction.Status.aborted
+        waits = defaultdict(set)
+        for s in tm.sites:
+            if s.status is not site.Status.running:
+                continue
+            for item_id, lock in s.lock_table.iteritems():
+                queue = [t for t in lock.queuing if t.status is not aborted]
+                self.locks[s.idx, item_id].add(len(queue))
+                for i, t in enumerate(queue):
+                    blockers = waits[t]
+                    blockers.update(lock.holders)
+                    blockers.update(queue[:i])
+                    blockers.discard(t)
+        for t, blockers in waits.iteritems():
+            for b in blockers:
+                self.blocked_by[b.name] += 1
+        chain = _longest_chain(waits)
+        if len(chain) > 1:
+            self.chains.setdefault(tuple(t.name for t in chain), tm.timestamp)
+
+    def hot_items(self):
+        """
+        :return: list of (item name, waiter ticks, contended ticks, peak queue) of the
+                 top items, locks of an item at different sites are added up
+        """
+        items = dict()
+        for (_, item_id), l in self.locks.iteritems():
+            waiters, contended, peak = items.get(item_id, (0, 0, 0))
+            items[item_id] = (waiters + l.waiters, contended + l.contended, max(peak, l.peak))
+        ranked = sorted(items.iteritems(), key=lambda (i, v): (-v[0], -v[1], i))
+        return [('x%d' % i, ) + v for i, v in ranked[:self.top] if v[0]]
+
+    def longest_chains(self):
+        """
+        Chains that are part of a longer one in the list are left out, a chain that
+        stays blocked for several ticks is seen again and again as it grows or shrinks
+
+        :return: list of (chain of transaction names, tick first seen), the waiter comes first
+        """
+        ranked = sorted(self.chains.iteritems(), key=lambda (c, ts): (-len(c), ts))
+        chains = []
+        seen = []
+        for c, ts in ranked:
+            if len(chains) == self.top:
+                break
+            joined = ' %s ' % ' '.join(c)
+            if any(joined in other for other in seen):
+                continue
+            seen.append(joined)
+            chains.append((list(c), ts))
+        return chains
+
+    def queue_depths(self):
+        """
+        :return: list of (site id, item name, average queue depth, peak queue depth, ticks)
+                 of the locks with the deepest average queue, averaged over the ticks the
+                 lock was in the lock table
+        """
+        ranked = sorted(self.locks.iteritems(), key=lambda (k, l): (-l.mean, k))
+        return [(site_id, 'x%d' % item_id, l.mean, l.peak, l.ticks)
+            for (site_id, item_id), l in ranked[:self.top] if l.waiters]
+
+    def top_blockers(self):
+        """
+        :return: list of (transaction name, number of waiters blocked summed over the samples)
+        """
+        ranked = sorted(self.blocked_by.iteritems(), key=lambda (name, n): (-n, name))
+        return ranked[:self.top]
+
+    def report(self, out=None):
+        """
+        Print the report
+
+        :param out: stream to print to, standard output if None
+        """
+        print('contention profile over %d ticks' % self.samples, file=out)
+        print('', file=out)
+        print('%-12s %12s %10s %8s' % ('item', 'waiter ticks', 'contended', 'peak'), file=out)
+        for row in self.hot_items():
+            print('%-12s %12d %10d %8d' % row, file=out)
+        print('', file=out)
+        print('%-8s %-6s %s' % ('length', 'tick', 'wait chain'), file=out)
+        for chain, ts in self.longest_chains():
+            print('%-8d %-6d %s' % (len(chain), ts, ' -> '.join(chain)), file=out)
+        print('', file=out)
+        print('%-6s %-12s %10s %8s %8s' % ('site', 'item', 'avg queue', 'peak', 'ticks'),
+            file=out)
+        for row in self.queue_depths():
+            print('%-6d %-12s %10.2f %8d %8d' % row, file=out)
+        print('', file=out)
+        print('%-12s %10s' % ('transaction', 'blocked'), file=out)
+        for row in self.top_blockers():
+            print('%-12s %10d' % row, file=out)
+
+
+def _longest_chain(waits):
+    """
+    Longest path of the wait-for edges, edges that close a cycle are ignored
+    Depth first with an explicit stack, wait chains can be longer than the recursion limit.
+    The longest chain from each transaction is kept as its length and the next transaction.
+
+    :param waits:   dictionary from a transaction to the set of transactions it waits for
+    :return:        list of transactions, each waits for the next one
+    """
+    length = dict()
+    following = dict()
+
+    def edges(t):
+        return iter(sorted(waits.get(t, ()), key=lambda b: b.seq))
+
+    start = None
+    for root in sorted(waits, key=lambda t: t.seq):
+        if root not in length:
+            path = set([root])
+            # entries are [transaction, remaining edges, chain length, next transaction]
+            stack = [[root, edges(root), 1, None]]
+            while stack:
+                top = stack[-1]
+                for b in top[1]:
+                    if b in path:
+                        continue
+                    if b not in length:
+                        path.add(b)
+                        stack.append([b, edges(b), 1, None])
+                        break
+                    if length[b] + 1 > top[2]:
+                        top[2], top[3] = length[b] + 1, b
+                else:
+                    # all edges of the top are visited
+                    t, _, n, b = stack.pop()
+                    path.discard(t)
+                    length[t] = n
+                    following[t] = b
+                    if stack and n + 1 > stack[-1][2]:
+                        stack[-1][2], stack[-1][3] = n + 1, t
+        if start is None or length[root] > length[start]:
+            start = root
+    longest = []
+    t = start
+    while t is not None:
+        longest.append(t)
+        t = following[t]
+    return longest
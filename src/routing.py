@@ -0,0 +1,72 @@
+# -----------------------------------------------------------------------------
+# routing.py
+#
+# Classes for choosing the replica a read/write transaction reads from
+# -----------------------------------------------------------------------------
+
+import random
+from enum import Enum
+
+
+class Routing(Enum):
+    """
+    Order in which a read/write transaction tries the sites of a variable
+    first:          placement order, the first running site is read
+    round_robin:    the starting site moves by one on every read
+    least_loaded:   sites with smaller lock tables first
+    home:           every transaction starts at its own replica, chosen by its begin order
+    random:         a random order for every read
+    """
+    first = 1
+    round_robin = 2
+    least_loaded = 3
+    home = 4
+    random = 5
+
+
+class ReadRouter(object):
+    """
+    Orders the replicas of a variable for a read, following one routing policy
+    """
+    def __init__(self, policy=Routing.first, seed=0):
+        """
+        :param policy:  the routing policy
+        :param seed:    seed of the random policy, so runs can be repeated
+        """
+        self.policy = policy
+        self._next = 0
+        self._random = random.Random(seed)
+
+    def order(self, t, x, queued=None):
+        """
+        Under every policy but first a read that was blocked goes back to the site it is
+        queuing at first, so it keeps its place in that queue. With first placement order is
+        kept as it always was, so the read may go to another site: an earlier copy that became
+        readable, or a later one when the queued copy became unreadable. The transaction then
+        leaves the queue at the old site, see ReadWriteTransaction.read.
+
+        :param t:       the reading transaction
+        :param x:       the variable to read
+        :param queued:  the site the read is queuing at, None if it is not blocked
+        :return:        the sites of x in the order to try them
+        """
+        sites = x.sites
+        if self.policy is Routing.first or len(sites) == 1:
+            return sites
+        if queued is not None and queued in sites:
+            return [queued] + [s for s in sites if s is not queued]
+        if self.policy is Routing.round_robin:
+            self._next += 1
+            return _rotate(sites, self._next)
+        if self.policy is Routing.least_loaded:
+            return sorted(sites, key=lambda s: len(s.lock_table))
+        if self.policy is Routing.home:
+            return _rotate(sites, t.seq)
+        sites = list(sites)
+        self._random.shuffle(sites)
+        return sites
+
+
+def _rotate(sites, i):
+    k = i % len(sites)
+    return sites[k:] + sites[:k]
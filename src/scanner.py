@@ -0,0 +1,99 @@
+# -----------------------------------------------------------------------------
+# scanner.py
+#
+# Hand-written scanner for the plain commands of the adb language
+# -----------------------------------------------------------------------------
+
+import string
+
+KEYWORDS = frozenset([
+    'begin', 'beginro', 'end', 'dump', 'fail', 'recover', 'r', 'w', 'quit', 'stats'])
+
+_WHITESPACE = ' \t'
+_NAME_CHARS = frozenset(string.ascii_letters + string.digits + '_')
+
+
+def scan(s):
+    """
+    Split a line into commands if it only has the plain forms
+        begin(N, ...)  beginRO(N, ...)  end(N, ...)  fail(I, ...)  recover(I, ...)
+        R(N, N)  W(N, N, I)  dump()  dump(N)  dump(I)  stats()  quit
+    where N is a name and I an integer literal, separated by semicolons.
+    Keywords are case insensitive and returned in lower case.
+
+    :param s:   one input line
+    :return:    list of (keyword, arguments), names are str and integers are int,
+                or None if the line needs the full parser
+    """
+    i = s.find('//')
+    if i >= 0:
+        s = s[:i]
+    s = s.rstrip('\n')
+    if '\n' in s:
+        return None
+    statements = s.split(';')
+    res = []
+    for k, stmt in enumerate(statements):
+        stmt = stmt.strip(_WHITESPACE)
+        if not stmt:
+            # only the statement list after the last semicolon may be empty
+            if k == len(statements) - 1:
+                break
+            return None
+        i = stmt.find('(')
+        if i < 0:
+            if stmt.lower() != 'quit':
+                return None
+            res.append(('quit', []))
+            continue
+        if not stmt.endswith(')') or stmt.count('(') != 1 or stmt.count(')') != 1:
+            return None
+        keyword = stmt[:i].rstrip(_WHITESPACE).lower()
+        inner = stmt[i + 1:-1].strip(_WHITESPACE)
+        args = map(_argument, inner.split(',')) if inner else []
+        if not _valid(keyword, args):
+            return None
+        res.append((keyword, args))
+    return res
+
+
+def _argument(a):
+    """
+    :return: the name, the integer, or None if a is neither
+    """
+    a = a.strip(_WHITESPACE)
+    if not a:
+        return None
+    if a.isdigit():
+        return int(a)
+    if a[0] == '-':
+        digits = a[1:].lstrip(_WHITESPACE)
+        return -int(digits) if digits.isdigit() else None
+    if a[0].isdigit() or not _NAME_CHARS.issuperset(a) or a.lower() in KEYWORDS:
+        return None
+    return a
+
+
+def _is_name(a):
+    return isinstance(a, str)
+
+
+def _is_number(a):
+    return isinstance(a, (int, long))
+
+
+def _valid(keyword, args):
+    if keyword in ('begin', 'beginro', 'end'):
+        return len(args) > 0 and all(map(_is_name, args))
+    if keyword in ('fail', 'recover'):
+        return len(args) > 0 and all(map(_is_number, args))
+    if keyword == 'r':
+        return len(args) == 2 and all(map(_is_name, args))
+    if keyword == 'w':
+        return (len(args) == 3 and _is_name(args[0]) and _is_name(args[1]) and
+                _is_number(args[2]))
+    if keyword == 'dump':
+        return len(args) == 0 or (len(args) == 1 and args[0] is not None)
+    if keyword == 'stats':
+        return len(args) == 0
+    return False
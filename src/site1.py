@@ -7,9 +7,16 @@
 import time
 import bisect
 import logging
+from collections import defaultdict, deque
 from enum import Enum
 import transaction
 from lock import FIFOLock, Mode
+from version_store import VersionStore
+
+# number of released locks kept for reuse
+LOCK_POOL_SIZE = 1024
+# lock table size that triggers the first sweep for idle locks
+LOCK_SWEEP_MIN = 1024
 
 
 class Status(Enum):
@@ -23,10 +30,18 @@ class Site(object):
     """
     def __init__(self, tm, idx):
         """
-        Create one site that manages data items and their locks.
-        Historical values are tracked for read only transactions
+        Create one site that manages data items and their locks, keyed by item id.
+        Historical values are tracked for read only transactions in a version store
         Write values are cached, only write the data item if transactions can commit
         Site fail and recovery time is stored, which is used to check if a transaction should commit
+        Locks and uncommitted values are also indexed by owner, so commit and abort only touch
+        the items a transaction has accessed
+        Locks nobody holds or waits for are removed from the lock table and kept in a small pool,
+        counters of the lock table churn are kept for lock_stats
+        Successful reads are counted in read_count
+        Replicated items that are stale after a recovery may be copied from running peers
+        a few at a time, if the transaction manager has a catch-up rate
+        In durable mode versions and breakpoints also go to a write-ahead log, see attach_log
 
         :param tm:  the global Transaction Manager
         :param idx: site id
@@ -35,23 +50,56 @@ class Site(object):
         self.idx = idx
         self.status = Status.running
         self.lock_table = dict()
-        self.historical_timestamps = dict()
-        self.historical_values = dict()
+        self.lock_table_peak = 0
+        self.locks_created = 0
+        self.locks_reused = 0
+        self.locks_reclaimed = 0
+        self._lock_pool = list()
+        self._lock_sweep_at = LOCK_SWEEP_MIN
+        self.versions = VersionStore()
         self.uncommitted_values = dict()
+        self.locks_held = defaultdict(set)
+        self.pending_writes = defaultdict(set)
         self.breakpoints = [self._tm.timestamp]
+        self.read_count = 0
+        self._catchup = deque()
+        self._replicated = set()
+        self.caught_up = 0
+        self.log = None
+
+    @property
+    def version_count(self):
+        return self.versions.version_count
+
+    @property
+    def lock_stats(self):
+        """
+        :return:    dictionary of the lock table size and its peak, and the number of locks
+                    created, reused from the pool and reclaimed so far
+        """
+        return dict(size=len(self.lock_table), peak=self.lock_table_peak,
+            created=self.locks_created, reused=self.locks_reused,
+            reclaimed=self.locks_reclaimed)
 
     @property
     def last_timestamp(self):
         return self.breakpoints[-1]
 
+    @property
+    def catching_up(self):
+        return bool(self._catchup)
+
     def fail(self):
         """
         Site fails
         The fail time is recorded. This will be used when a transaction trying to commit
         """
         self.status = Status.failed
+        self._catchup.clear()
         self.breakpoints.append(self._tm.timestamp) # add a breakpoint
-        logging.debug('site %d is failed' % self.idx)
+        if self.log is not None:
+            self.log.fail(self._tm.timestamp)
+        logging.debug('site %d is failed', self.idx)
 
     def recover(self):
         """
@@ -59,12 +107,20 @@ class Site(object):
         reset all locks
         reset all uncommitted values
         add recovery time stamp
+        queue stored replicated items for catch-up if it is enabled
         """
         self.status = Status.running
         self.lock_table = dict() # all locks were lost
+        self._lock_sweep_at = LOCK_SWEEP_MIN
         self.uncommitted_values = dict() # all uncommitted were lost
+        self.locks_held = defaultdict(set)
+        self.pending_writes = defaultdict(set)
         self.breakpoints.append(self._tm.timestamp) # add a breakpoint
-        logging.debug('site %d is recovered' % self.idx)
+        if self.log is not None:
+            self.log.recover(self._tm.timestamp)
+        if self._tm.catchup_rate:
+            self._catchup = deque(i for i in self.versions if i in self._replicated)
+        logging.debug('site %d is recovered', self.idx)
 
     def read(self, t, x, ts=None):
         """
@@ -78,41 +134,44 @@ class Site(object):
         :return:    None, None  if site is down
                     Set, None   if the transaction need to wait because the item is locked.
                                 the Set contains transactions to wait for
+                    False, None if the transaction should abort instead of waiting
                     True, val   if succeed. the val is the value by perform read.
         """
         if ts is None:
             ts = self._tm.timestamp
         assert self.status == Status.running
         if isinstance(t, transaction.ReadOnlyTransaction):
-            logging.debug('ts = %d' % ts)
-            logging.debug(str(self.historical_timestamps[x.name]))
-            logging.debug(str(self.historical_values[x.name]))
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                logging.debug('ts = %d', ts)
+                logging.debug(str(self.versions.history(x.id)))
             # read from persistent data structure
             # should return (ts, val)
-            i = bisect.bisect_left(self.historical_timestamps[x.name], ts) - 1
-            assert i >= 0
+            version = self.versions.before(x.id, ts)
+            assert version is not None
+            version_ts, val = version
             # ignore availability if it is the only site
             if len(x.sites) == 1:
-                return (True,
-                    self.historical_values[x.name][i])
+                self.read_count += 1
+                return True, val
             # check availability
             j = bisect.bisect_left(self.breakpoints, ts) - 1
             assert j >= 0
             if j % 2 == 1: # even number of breakpoints: failed at that time
                 return False, None
-            elif self.historical_timestamps[x.name][i] < self.breakpoints[j]:
+            elif version_ts < self.breakpoints[j]:
                 return False, None
-            return (True,
-                self.historical_values[x.name][i])
+            self.read_count += 1
+            return True, val
         else:
             if self._initialized(x):
-                ret = self._acquire_lock(t, x.name, mode=Mode.read)
+                ret = self._acquire_lock(t, x.id, mode=Mode.read)
                 if ret is True:
                     # success
-                    if x.name in self.uncommitted_values:
-                        return True, self.uncommitted_values[x.name][-1]
+                    self.read_count += 1
+                    if x.id in self.uncommitted_values:
+                        return True, self.uncommitted_values[x.id][-1]
                     else:
-                        return True, self.historical_values[x.name][-1]
+                        return True, self.versions.latest(x.id)
                 else:
                     # failed
                     return ret, None
@@ -128,25 +187,88 @@ class Site(object):
         :param t:   transaction that try to write
         :param x:   the variable to write
         :param val: the value to write
-        :return:    True if succeed, else return the set of transaction to wait for getting the lock
+        :return:    True if succeed, else return the set of transaction to wait for getting the lock,
+                    or False if the transaction should abort instead of waiting
         """
         assert self.status == Status.running
         assert not isinstance(t, transaction.ReadOnlyTransaction)
-        if self._initialized(x):
-            ret = self._acquire_lock(t, x.name, mode=Mode.write)
-            if ret is True:
-                # success
-                self.uncommitted_values[x.name] = t, val
-                return True
-            else:
-                return ret
-        else:
-            # use write to initialize
-            assert x.name not in self.lock_table
-            ret = self._acquire_lock(t, x.name, mode=Mode.write)
-            assert ret
-            self.uncommitted_values[x.name] = t, val
-            return True
+        # an item that is not initialized after recovery is written to initialize it,
+        # other writers may already hold or wait for its lock
+        ret = self._acquire_lock(t, x.id, mode=Mode.write)
+        if ret is True:
+            # success
+            self._stage(t, x.id, val)
+        return ret
+
+    def dequeue(self, t, item_id):
+        """
+        Take t out of the lock queue of an item, used when t ends or reads another copy
+        The lock is reclaimed if nobody holds or waits for it any more
+
+        :param t:       the transaction that stops waiting
+        :param item_id: id of the item t was queuing for
+        """
+        lock = self.lock_table.get(item_id)
+        if lock is not None:
+            lock.dequeue(t)
+            if lock.idle():
+                self._reclaim_lock(item_id)
+
+    def load(self, pairs, ts, replicated=True):
+        """
+        Bulk load initial versions without locking, used by the catalog to initialize data items
+        Variables that already have versions are left alone
+        Only replicated variables are caught up, as there is no other copy of the rest.
+        A replicated variable the catalog creates after this site recovered (or restores from
+        the log of a previous run) is as stale as the ones it stored before, it is queued
+        for catch-up like them
+
+        :param pairs:       list of (item id, initial value)
+        :param ts:          time stamp of the initial versions
+        :param replicated:  True if the variables are stored at other sites too
+        """
+        if replicated:
+            new = [i for i, _ in pairs if i not in self._replicated]
+            self._replicated.update(new)
+            if (self._tm.catchup_rate and self.status == Status.running and
+                    ts < self.last_timestamp):
+                self._catchup.extend(new)
+        if self.log is not None:
+            pairs = [(i, val) for i, val in pairs if i not in self.versions]
+            for i, val in pairs:
+                self.log.version(i, ts, val)
+        self.versions.load(pairs, ts)
+
+    def attach_log(self, log):
+        """
+        Make the site durable: rebuild its versions and breakpoints from the checkpoint and
+        log of a previous run, if there are any, and log all changes from now on.
+        The site is failed if it was failed when the previous run stopped.
+
+        :param log: a wal.SiteLog
+        :return:    the largest time stamp of the saved state, None if there was none
+        """
+        last = log.replay(self.versions, self.breakpoints)
+        if log.failed:
+            self.status = Status.failed
+        self.log = log
+        return last
+
+    def checkpoint(self):
+        """
+        Write a checkpoint of the site and truncate its log
+
+        :return:    size of the checkpoint in bytes
+        """
+        return self.log.checkpoint(
+            self.versions, self.breakpoints, self.status == Status.failed)
+
+    def committed_value(self, item_id):
+        """
+        :param item_id: id of a data item stored at this site
+        :return:        the latest committed value, used for dump
+        """
+        return self.versions.latest(item_id)
 
     def available(self, ts):
         """
@@ -158,6 +280,53 @@ class Site(object):
         assert self.status == Status.running
         return ts > self.last_timestamp # caution: > or >=?
 
+    def readable(self, x):
+        """
+        :param x:   a variable stored at this site
+        :return:    True if read/write transactions can read x here
+        """
+        return self.status == Status.running and self._initialized(x)
+
+    def catch_up(self, limit):
+        """
+        Copy the latest committed versions of stale replicated items from running peers,
+        so they can be read before a transaction writes them again.
+        The copy is archived at the current time, which is after every commit of this tick.
+        An item that is written here will be initialized by that commit, and an item with
+        an uncommitted write at a peer is tried again later, as the write may commit
+        without reaching this site. Items no running peer has a current copy of are
+        left stale.
+
+        :param limit:   number of queued items to look at
+        :return:        number of items copied
+        """
+        assert self.status == Status.running
+        ts = self._tm.timestamp
+        since = self.last_timestamp
+        copied = 0
+        for _ in xrange(min(limit, len(self._catchup))):
+            item_id = self._catchup.popleft()
+            if item_id in self.uncommitted_values:
+                self._catchup.append(item_id)
+                continue
+            if self.versions.committed_since(item_id, since):
+                continue
+            peers = [s for s in self._tm.sites if s is not self and
+                s.status == Status.running and item_id in s.versions]
+            if any(item_id in s.uncommitted_values for s in peers):
+                self._catchup.append(item_id)
+                continue
+            for s in peers:
+                if s.versions.committed_since(item_id, s.last_timestamp):
+                    self._archive(item_id, ts, s.versions.latest(item_id))
+                    copied += 1
+                    break
+        self.caught_up += copied
+        if copied:
+            logging.debug('site %d caught up %d items, %d queued',
+                self.idx, copied, len(self._catchup))
+        return copied
+
     def commit(self, t):
         """
         Write uncommitted values from transaction t to historical values
@@ -166,7 +335,7 @@ class Site(object):
 
         :param t:   The transaction to commit
         """
-        self._clean(t, write=True)
+        self.end(committed=(t, ))
 
     def abort(self, t):
         """
@@ -175,50 +344,102 @@ class Site(object):
 
         :param t:   The transaction to abort
         """
-        self._clean(t, write=False)
+        self.end(aborted=(t, ))
 
-    def _clean(self, t, write=False):
+    def end(self, committed=(), aborted=()):
+        """
+        Commit and abort transactions that end at the same time in one pass
+        Values of committed transactions are archived, uncommitted values of all of them are
+        cleared and their locks released. A lock that several of them held is checked for
+        reclamation once, after all of them released it.
+
+        :param committed:   transactions to commit, in commit order
+        :param aborted:     transactions to abort
+        """
         assert self.status == Status.running
-        # write into persistent data structure
-        r = []
-        for x in self.uncommitted_values:
-            owner, val = self.uncommitted_values[x]
-            if owner is t:
-                if write is True:
-                    self._archive(x, self._tm.timestamp, val)
-                r.append(x)
-        for x in r:
-            del self.uncommitted_values[x]
+        ts = self._tm.timestamp
+        for t in committed:
+            # write into persistent data structure
+            for x in self.pending_writes.pop(t, ()):
+                owner, val = self.uncommitted_values.pop(x)
+                assert owner is t
+                self._archive(x, ts, val)
+        for t in aborted:
+            for x in self.pending_writes.pop(t, ()):
+                self.uncommitted_values.pop(x)
         # clean lock table
-        self._release_lock(t)
+        released = set()
+        for transactions in (committed, aborted):
+            for t in transactions:
+                for x in self.locks_held.pop(t, ()):
+                    self.lock_table[x].release(t)
+                    released.add(x)
+        for x in released:
+            if self.lock_table[x].idle():
+                self._reclaim_lock(x)
 
-    def _archive(self, name, ts, val):
-        if name not in self.historical_values:
-            self.historical_timestamps[name] = [ts]
-            self.historical_values[name] = [val]
-        else:
-            # ensure times grows
-            if len(self.historical_timestamps) > 0:
-                assert self.historical_timestamps[name][-1] < ts
-            self.historical_timestamps[name].append(ts)
-            self.historical_values[name].append(val)
+    def collect_garbage(self, horizon):
+        """
+        Drop versions that are invisible to read only transactions started at or after horizon
+        Such a transaction reads the last version before its timestamp, so that one and
+        all later versions are kept. The latest version always stays, which is all that
+        read/write transactions and the initialization check after recovery look at.
+
+        :param horizon: creation time of the oldest read only transaction that may read
+        :return:        number of versions reclaimed
+        """
+        return self.versions.prune(horizon)
+
+    def _stage(self, t, x, val):
+        self.uncommitted_values[x] = t, val
+        self.pending_writes[t].add(x)
+
+    def _archive(self, item_id, ts, val):
+        # time stamps of an item must grow
+        self.versions.append(item_id, ts, val)
+        if self.log is not None:
+            self.log.version(item_id, ts, val)
 
     def _acquire_lock(self, t, x, mode):
-        if x not in self.lock_table:
-            self.lock_table[x] = FIFOLock()
-        return self.lock_table[x].acquire(t, mode)
+        lock = self.lock_table.get(x)
+        if lock is None:
+            lock = self.lock_table[x] = self._new_lock()
+        since = lock.since.get(t)
+        ret = lock.acquire(t, mode, self._tm.policy, self._tm.timestamp)
+        if ret is True:
+            self.locks_held[t].add(x)
+            if since is not None:
+                self._tm.metrics.lock_wait(self.idx, x, self._tm.timestamp - since)
+        return ret
+
+    def _new_lock(self):
+        if len(self.lock_table) >= self._lock_sweep_at:
+            self._sweep_locks()
+        self.lock_table_peak = max(self.lock_table_peak, len(self.lock_table) + 1)
+        if self._lock_pool:
+            self.locks_reused += 1
+            return self._lock_pool.pop()
+        self.locks_created += 1
+        return FIFOLock()
 
-    def _release_lock(self, t):
-        for x in self.lock_table:
-            self.lock_table[x].release(t)
+    def _reclaim_lock(self, x):
+        lock = self.lock_table.pop(x)
+        self.locks_reclaimed += 1
+        if len(self._lock_pool) < LOCK_POOL_SIZE:
+            self._lock_pool.append(lock)
+
+    def _sweep_locks(self):
+        """
+        Reclaim idle locks that were never released, e.g. the ones only aborted transactions waited for
+        Sweeps are amortized, the next one is due when the lock table has doubled
+        """
+        for x in [x for x, lock in self.lock_table.iteritems() if lock.idle()]:
+            self._reclaim_lock(x)
+        self._lock_sweep_at = max(LOCK_SWEEP_MIN, 2 * len(self.lock_table))
 
     def _initialized(self, x):
-        if x.name in self.uncommitted_values:
+        if x.id in self.uncommitted_values:
             return True
         if len(x.sites) == 1:
             return True
-        if x.name not in self.historical_values:
-            return False
-        i = bisect.bisect_left(self.historical_timestamps[x.name],
-                self.last_timestamp)
-        return i < len(self.historical_timestamps[x.name])
+        return self.versions.committed_since(x.id, self.last_timestamp)
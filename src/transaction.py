@@ -7,7 +7,9 @@
 from __future__ import print_function
 import time
 import logging
+from collections import OrderedDict
 import site1 as site
+import metrics
 from enum import Enum
 
 
@@ -20,31 +22,51 @@ class Status(Enum):
     aborted = 6
 
 
+class Names(object):
+    """
+    Log argument for a collection of transactions, the list of names is only
+    built if the message is actually formatted
+    """
+    def __init__(self, transactions):
+        self.transactions = transactions
+
+    def __str__(self):
+        return str(map(lambda y: y.name, list(self.transactions)))
+
+
+class Opcode(Enum):
+    read = 1
+    write = 2
+    commit = 3
+
+
 class Operation(object):
     """
     Single Operation
     Maintains by Transaction.
     Operation id is used to track the sequence order of operations in the input, used to enforce FIFO
     """
-    def __init__(self, transaction, id, op, args, kwargs):
+    __slots__ = ('id', 'code', 'args')
+
+    def __init__(self, id, code, args):
         """
-        :param transaction: the transaction that maintains this operation
         :param id:          operation id, assigned by the global transaction manager
-        :param op:          the operation method
+        :param code:        the Opcode, the transaction method to run
         :param args:        arguments for operation
-        :param kwargs:      keywords arguments for operation
         """
-        self._t = transaction
         self.id = id
-        self.op = op
+        self.code = code
         self.args = args
-        self.kwargs = kwargs
 
 
 class TransactionBase(object):
     """
     Abstract class for transaction.
     """
+    __slots__ = ('_tm', 'name', 'status', 'creation_timestamp', 'seq',
+                 'operations', 'results', 'extras', 'extra', 'next_op_index',
+                 'queue_seq')
+
     def __init__(self, tm, name, status=Status.created):
         """
         Create a new transaction, record time step from the transaction manager
@@ -59,11 +81,21 @@ class TransactionBase(object):
         self.name = name
         self.status = status
         self.creation_timestamp = self._tm.timestamp
+        self.seq = 0
         self.operations = list()
         self.results = list()
         self.extras = list()
+        self.extra = None
         self.next_op_index = 0
+        self.queue_seq = None
     
+    @property
+    def priority(self):
+        """
+        :return: a key to compare transaction ages, smaller is older
+        """
+        return self.creation_timestamp, self.seq
+
     @property
     def next_op(self):
         if self.next_op_index >= len(self.operations):
@@ -72,20 +104,23 @@ class TransactionBase(object):
 
     def set_status(self, status):
         logging.info(
-            'set transaction %s\'s status from %s to %s' % (
-                self.name, self.status, status))
-        self.status = status
+            'set transaction %s\'s status from %s to %s',
+            self.name, self.status, status)
+        old, self.status = self.status, status
+        self._tm.update_status(self, old, status)
 
-    def append_operation(self, op, *args, **kwargs):
+    def append_operation(self, code, *args):
         """
         Create a new Operation with give arguments and append this Operation to the operation list
         Update next_op and next_op_index if necessary
 
-        :param op:      The operation method
+        :param code:    The Opcode of the operation
         :param args:    arguments for operation
-        :param kwargs:  keywords arguments for operation
         """
-        self.operations.append(Operation(self, self._tm.get_op_id(), op, args, kwargs))
+        self.operations.append(Operation(self._tm.get_op_id(), code, args))
+        if self.next_op_index == len(self.operations) - 1:
+            # nothing pending, the new operation is next
+            self._tm.schedule(self)
 
     def next_operation(self):
         """
@@ -93,14 +128,26 @@ class TransactionBase(object):
         Update next_op and next_op_index
         """
         assert self.status == Status.running
-        if self.next_op is not None:
+        op = self.next_op
+        if op is not None:
             self.extra = None
-            op, args, kwargs = self.next_op.op, self.next_op.args, self.next_op.kwargs
-            ret = op(*args, **kwargs)
+            if op.code is Opcode.read:
+                ret = self.read(*op.args)
+            elif op.code is Opcode.write:
+                ret = self.write(*op.args)
+            else:
+                ret = self.commit()
             if ret is not False:
-                self.results.append(ret)
-                self.extras.append(self.extra)
-                self.next_op_index += 1
+                self._complete(ret)
+
+    def _complete(self, ret):
+        """
+        Record the result of the next operation and move on to the one after it
+        """
+        self.results.append(ret)
+        self.extras.append(self.extra)
+        self.next_op_index += 1
+        self._tm.completed_operations += 1
 
     def read(self, x):
         assert self.status == Status.running
@@ -114,15 +161,16 @@ class TransactionBase(object):
         if self.status is not Status.committed:
             self.set_status(Status.committed)
         # print
-        print('%s commits' % self.name)
+        print('%s commits' % self.name, file=self._tm.out)
         # print values read at commit time
+        verbose = logging.getLogger().isEnabledFor(logging.INFO)
         for val, extra in zip(self.results, self.extras):
             if val is not True:
-                if (extra is None or 
-                    logging.getLogger().getEffectiveLevel() > logging.INFO):
-                    print(val)
+                if extra is None or not verbose:
+                    print(val, file=self._tm.out)
                 else:
-                    print(val, extra) # print something else
+                    print(val, '(site = %d, tick = %d)' % extra,
+                        file=self._tm.out) # print something else
         return True
 
 
@@ -132,11 +180,18 @@ class ReadWriteTransaction(TransactionBase):
     At commit time, all sites are checked for their status. If any site fails during this transaction,
     this transaction is aborted.
     """
+    __slots__ = ('wait_for', 'waited_by', 'accessed', 'blocked_site', 'queued')
+
     def __init__(self, tm, name, status=Status.created):
         """
         Create a new read/write transaction.
         empty sets of transactions that the current transaction is waiting or being waiting for
-        is created. This is used for deadlock detection.
+        is created. This is used for deadlock detection, and only changed through the wait-for graph
+        of the transaction manager.
+        Accessed sites are kept with the time of their first access, which is all that commit
+        time validation checks.
+        The lock queues the transaction waits in are kept in queued, from site to item id,
+        it leaves them when it ends.
 
         :param tm:      the global transaction manager
         :param name:    transaction name
@@ -145,49 +200,63 @@ class ReadWriteTransaction(TransactionBase):
         TransactionBase.__init__(self, tm, name, status=status)
         self.wait_for = set()
         self.waited_by = set()
-        self.accessed = list()
+        self.accessed = dict()
+        self.blocked_site = None
+        self.queued = dict()
 
     def read(self, x):
         """
-        Read variable x from available site
+        Read variable x from available site, sites are tried in the order of the read routing
+        policy of the transaction manager
 
         :param x:   the variable to read
         :return:    return the value that the operation read, False if the operation fails
         """
         assert self.status == Status.running
-        for s in x.sites:
+        sites = self._tm.router.order(self, x, self.blocked_site)
+        self.blocked_site = None
+        for s in sites:
             if s.status == site.Status.running:
                 ret, val = s.read(self, x)
                 if ret is True:
                     # success
-                    self.accessed.append((s, self._tm.timestamp))
-                    logging.info(
-                        'transaction %s reads %s=%d in its %d-th operation' % (
-                            self.name, x.name, val, self.next_op_index))
-                    logging.debug(
-                        'transaction %s accessed site %d at %d' % (
-                            self.name, s.idx, self._tm.timestamp))
-                    # print
-                    logging.info(val)
-                    self.extra = '(site = %d, tick = %d)' % (
-                        s.idx, self._tm.timestamp)
+                    self.accessed.setdefault(s, self._tm.timestamp)
+                    if self.queued:
+                        # served at another copy than the one it was queuing for
+                        self._leave_queues()
+                    if logging.getLogger().isEnabledFor(logging.INFO):
+                        logging.info(
+                            'transaction %s reads %s=%d in its %d-th operation',
+                            self.name, x.name, val, self.next_op_index)
+                        logging.debug(
+                            'transaction %s accessed site %d at %d',
+                            self.name, s.idx, self._tm.timestamp)
+                        # print
+                        logging.info(val)
+                    self.extra = (s.idx, self._tm.timestamp)
                     return val
+                elif ret is False:
+                    # aborted by deadlock prevention
+                    logging.info(
+                        'transaction %s is aborted reading %s '
+                        'in its %d-th operation',
+                        self.name, x.name, self.next_op_index)
+                    self._tm.metrics.abort(metrics.DIED)
+                    self.kill()
+                    return False
                 elif ret is not None:
                     # blocked by other transactions
                     logging.info(
                         'transaction %s fails to read %s '
                         'in its %d-th operation, '
-                        'and it is now blocked by %s' % (
-                            self.name, x.name, self.next_op_index, 
-                            str(map(
-                                lambda y: y.name, list(ret)))))
-                    self.wait_for.update(ret)
+                        'and it is now blocked by %s',
+                        self.name, x.name, self.next_op_index, Names(ret))
+                    self.blocked_site = s
+                    self.queued[s] = x.id
+                    self._tm.block(self, ret)
                     logging.debug(
-                        'transaction %s\'s wait_for=%s' % (
-                            self.name, 
-                            str(map(lambda y: y.name, list(self.wait_for)))))
-                    for t in ret:
-                        t.waited_by.add(self)
+                        'transaction %s\'s wait_for=%s',
+                        self.name, Names(self.wait_for))
                     self.set_status(Status.blocked)
                     return False
                 else:
@@ -214,26 +283,34 @@ class ReadWriteTransaction(TransactionBase):
                 ret = s.write(self, x, val)
                 if ret is True:
                     # success
-                    self.accessed.append((s, self._tm.timestamp))
+                    self.accessed.setdefault(s, self._tm.timestamp)
+                    if logging.getLogger().isEnabledFor(logging.INFO):
+                        logging.info(
+                            'transaction %s writes %s=%d on site %d '
+                            'in its %d-th operation',
+                            self.name, x.name, val, s.idx, self.next_op_index)
+                        logging.debug(
+                            'transaction %s accessed site %d at %d',
+                            self.name, s.idx, self._tm.timestamp)
+                elif ret is False:
+                    # aborted by deadlock prevention
                     logging.info(
-                        'transaction %s writes %s=%d on site %d '
-                        'in its %d-th operation' % (
-                            self.name, x.name, val, s.idx, self.next_op_index))
-                    logging.debug(
-                        'transaction %s accessed site %d at %d' % (
-                            self.name, s.idx, self._tm.timestamp))
+                        'transaction %s is aborted writing %s=%d on site %d '
+                        'in its %d-th operation',
+                        self.name, x.name, val, s.idx, self.next_op_index)
+                    self._tm.metrics.abort(metrics.DIED)
+                    self.kill()
+                    return False
                 elif ret is not None:
                     # blocked by other transactions
                     logging.info(
                         'transaction %s fails to write %s=%d on site %d '
                         'in its %d-th operation, '
-                        'and it is now blocked by %s' % (
-                            self.name, x.name, val, s.idx, self.next_op_index,
-                            str(map(
-                                lambda y: y.name, list(ret)))))
-                    self.wait_for.update(ret)
-                    for t in ret:
-                        t.waited_by.add(self)
+                        'and it is now blocked by %s',
+                        self.name, x.name, val, s.idx, self.next_op_index,
+                        Names(ret))
+                    self.queued[s] = x.id
+                    self._tm.block(self, ret)
                     failed = True
                     break
                     # do not exit, try to get as much locks as I can
@@ -243,21 +320,22 @@ class ReadWriteTransaction(TransactionBase):
         # failed?
         if failed:
             logging.debug(
-                'transaction %s\'s wait_for=%s' % (
-                    self.name, 
-                    str(map(lambda y: y.name, list(self.wait_for)))))
+                'transaction %s\'s wait_for=%s',
+                self.name, Names(self.wait_for))
             self.set_status(Status.blocked)
             return False
         # all success?
+        if self.queued:
+            self._leave_queues()
         if written:
             logging.info(
                 'transaction %s successfuly writes %s=%d '
-                'in its %d-th operation' % (
-                self.name, x.name, val, self.next_op_index))
+                'in its %d-th operation',
+                self.name, x.name, val, self.next_op_index)
         else:
             logging.info(
                 'no site is up for transaction %s to write '
-                'in its %d-th operation' % (self.name, self.next_op_index))
+                'in its %d-th operation', self.name, self.next_op_index)
         return written
 
     def commit(self):
@@ -268,27 +346,55 @@ class ReadWriteTransaction(TransactionBase):
 
         :return:    True if commit successes
         """
-        logging.info('commit time: transaction %s' % self.name)
-        committable = True
-        # validation
-        for s, ts in self.accessed:
-            if s.status == site.Status.running:
-                if not s.available(ts):
-                    # not still available
-                    logging.info(
-                        'abort transaction %s at commit time '
-                        'because of site %d' % (self.name, s.idx))
-                    committable = False
-            else:
-                # failed
-                logging.info(
-                    'abort transaction %s at commit time '
-                    'because of site %d' % (self.name, s.idx))
-                committable = False
-        self.set_status(Status.committed if committable else Status.aborted)
+        logging.info('commit time: transaction %s', self.name)
+        if self._validate():
+            self.set_status(Status.committed)
+        else:
+            self._tm.metrics.abort(metrics.VALIDATION)
+            self.set_status(Status.aborted)
         self._clean()
         return True
 
+    @staticmethod
+    def commit_group(transactions):
+        """
+        Commit transactions whose commit operations run one after another in the same tick,
+        with the same result as committing them one by one. Validation of one does not
+        depend on the others, so the running sites and their last recovery are looked up
+        once for all of them. Each site commits and aborts all of them in one pass, then
+        waiters are woken and results printed in commit order.
+
+        :param transactions:    running transactions whose next operation is a commit
+        """
+        tm = transactions[0]._tm
+        recovered = dict(
+            (s, s.last_timestamp) for s in tm.sites if s.status is site.Status.running)
+        ending = OrderedDict()
+        for t in transactions:
+            logging.info('commit time: transaction %s', t.name)
+            t.extra = None
+            online = list()
+            committable = True
+            for s, ts in t.accessed.iteritems():
+                if s in recovered and ts > recovered[s]:
+                    online.append(s)
+                else:
+                    committable = False
+            if not committable:
+                # log why and collect the running sites to abort at
+                t._validate()
+                online = t._online_sites()
+                tm.metrics.abort(metrics.VALIDATION)
+            t.set_status(Status.committed if committable else Status.aborted)
+            k = 0 if committable else 1
+            for s in online:
+                ending.setdefault(s, ([], []))[k].append(t)
+        for s, (committed, aborted) in ending.iteritems():
+            s.end(committed, aborted)
+        for t in transactions:
+            t._finish()
+            t._complete(True)
+
     def kill(self):
         """
         Kill a read/write transaction.
@@ -297,43 +403,71 @@ class ReadWriteTransaction(TransactionBase):
 
         :return:    True if abort successes
         """
-        logging.info('kill: transaction %s' % self.name)
+        logging.info('kill: transaction %s', self.name)
         self.set_status(Status.aborted)
         self._clean()
         return True
 
-    def _clean(self):
-        online_sites = set()
-        for s, ts in self.accessed:
+    def _validate(self):
+        """
+        :return:    True if every accessed site is running and did not fail since the access
+        """
+        committable = True
+        for s, ts in self.accessed.iteritems():
             if s.status == site.Status.running:
-                online_sites.add(s)
+                if not s.available(ts):
+                    # not still available
+                    logging.info(
+                        'abort transaction %s at commit time '
+                        'because of site %d', self.name, s.idx)
+                    committable = False
+            else:
+                # failed
+                logging.info(
+                    'abort transaction %s at commit time '
+                    'because of site %d', self.name, s.idx)
+                committable = False
+        return committable
+
+    def _online_sites(self):
+        return [s for s in self.accessed if s.status == site.Status.running]
+
+    def _clean(self):
         # commit/abort at each site
-        for s in online_sites:
+        for s in self._online_sites():
             if self.status == Status.committed:
                 s.commit(self)
             else:
                 s.abort(self)
+        self._finish()
+
+    def _leave_queues(self):
+        for s, item_id in self.queued.iteritems():
+            s.dequeue(self, item_id)
+        self.queued.clear()
+
+    def _finish(self):
+        if self.queued:
+            self._leave_queues()
         # update blocked transactions
-        for t in self.wait_for:
-            t.waited_by.remove(self)
-        for t in self.waited_by:
-            t.wait_for.remove(self)
+        for t in self._tm.wait_for_graph.remove(self):
             logging.debug(
-                'transaction %s\'s wait_for=%s' % (
-                    t.name, str(map(lambda y: y.name, list(t.wait_for)))))
+                'transaction %s\'s wait_for=%s', t.name, Names(t.wait_for))
             if len(t.wait_for) == 0:
                 t.set_status(Status.ready)
         # print
         if self.status == Status.committed:
             TransactionBase.commit(self)
         else:
-            print('%s aborts' % self.name)
+            print('%s aborts' % self.name, file=self._tm.out)
 
 
 class ReadOnlyTransaction(TransactionBase):
     """
     Read Only Transaction
     """
+    __slots__ = ()
+
     def read(self, x):
         """
         Read variable x using Multiversion Read Consistency
@@ -349,12 +483,12 @@ class ReadOnlyTransaction(TransactionBase):
                 ret, val = s.read(self, x, ts=self.creation_timestamp)
                 if ret is True:
                     # print
-                    logging.info(
-                        'transaction %s reads %s=%d in its %d-th operation' % 
-                        (self.name, x.name, val, self.next_op_index))
-                    logging.info(val)
-                    self.extra = '(site = %d, tick = %d)' % (
-                        s.idx, self._tm.timestamp)
+                    if logging.getLogger().isEnabledFor(logging.INFO):
+                        logging.info(
+                            'transaction %s reads %s=%d in its %d-th operation',
+                            self.name, x.name, val, self.next_op_index)
+                        logging.info(val)
+                    self.extra = (s.idx, self._tm.timestamp)
                     return val
         self.set_status(Status.ready)
         return False
@@ -4,23 +4,91 @@
 # Classes for transaction manager
 # -----------------------------------------------------------------------------
 
+import os
+import time
+import heapq
+from collections import OrderedDict
+import logging
 from transaction import Status as TransactionStatus
+from transaction import ReadOnlyTransaction, ReadWriteTransaction, Opcode
+from deadlock import WaitForGraph
+from lock import Policy
+from routing import Routing, ReadRouter
+from wal import SiteLog
+from metrics import Metrics, DEADLOCK, WOUNDED
 import site1 as site
 
+FINISHED = (TransactionStatus.committed, TransactionStatus.aborted)
+
 
 class TransactionManager(object):
     """
     Transaction manager manages all transactions, performs operations as requested by transactions,
     detects deadlocks and resolves the problem by killing the youngest transaction.
     """
-    def __init__(self):
+    def __init__(self, sites=10, policy=Policy.detect, gc_interval=None, gc_threshold=None,
+            routing=Routing.first, catchup_rate=None, wal_dir=None, checkpoint_interval=None,
+            wal_sync=True, out=None, profiler=None):
         """
-        Create transaction list, system timestamp, operation id, and list of sites
+        Create transaction indexes, system timestamp, operation id, and list of sites
+        Active transactions are kept in creation order and indexed by status,
+        finished (committed or aborted) ones are dropped and only counted, as are
+        the operations that transactions completed
+        Pending operations of running transactions are kept in a heap keyed by operation id
+
+        Old versions are garbage collected every gc_interval ticks, or when the sites store
+        more than gc_threshold versions, no collection is done if both are None
+        Recovered sites copy up to catchup_rate stale items from their peers every tick
+        With a wal_dir every site logs its versions and breakpoints there, the records of a
+        tick are written together at its end, and the state of a previous run in wal_dir is
+        restored first. Sites write checkpoints every checkpoint_interval ticks.
+        Timing and contention metrics are collected in self.metrics, a profiler samples
+        the lock tables at the end of every tick.
+
+        :param sites:           number of sites
+        :param policy:          how lock conflicts are resolved, deadlock detection by default
+        :param gc_interval:     number of ticks between two garbage collections
+        :param gc_threshold:    number of stored versions that triggers a garbage collection
+        :param routing:         which replica read/write transactions read from
+        :param catchup_rate:    number of items a recovered site catches up per tick, no
+                                catch-up if None, stale items are then written to be read
+        :param wal_dir:         directory of the logs and checkpoints of the sites, None to keep
+                                all state in memory
+        :param checkpoint_interval: number of ticks between two checkpoints
+        :param wal_sync:        fsync logs and checkpoints when they are written
+        :param out:             stream commits, aborts, and read values are printed to,
+                                standard output if None
+        :param profiler:        a profiler.ContentionProfiler, or None
         """
-        self.transactions = list()
+        self.policy = policy
+        self.out = out
+        self.metrics = Metrics()
+        self.profiler = profiler
+        self.router = ReadRouter(routing)
+        self.gc_interval = gc_interval
+        self.gc_threshold = gc_threshold
+        self.gc_reclaimed = 0
+        self.catchup_rate = catchup_rate
+        self.transactions = OrderedDict()
+        self.committed = 0
+        self.aborted = 0
+        self.completed_operations = 0
+        self._status_index = dict(
+            (s, OrderedDict()) for s in TransactionStatus if s not in FINISHED)
         self.timestamp = 0
-        self.sites = [site.Site(self, i + 1) for i in xrange(10)]
+        self.sites = [site.Site(self, i + 1) for i in xrange(sites)]
         self._op_id = 0
+        self._op_queue = list()
+        self._queue_seq = 0
+        self.wait_for_graph = WaitForGraph(
+            age=lambda t: t.priority, detect=policy is Policy.detect)
+        self._wounded = OrderedDict()
+        self._txn_seq = 0
+        self._read_only = OrderedDict()
+        self.checkpoint_interval = checkpoint_interval
+        self.durable = wal_dir is not None
+        if self.durable:
+            self._open_logs(wal_dir, wal_sync)
 
     def sleep(self, timeout=1):
         self.timestamp += timeout
@@ -29,66 +97,185 @@ class TransactionManager(object):
         """
         Let all ready transactions run next operation
         operation id is used for FIFO
-        Detect deadlock after try to run all operation
-        """
-        ready_transactions = filter(
-            lambda t: t.status == TransactionStatus.ready,
-            self.transactions)
-        map(lambda t: t.set_status(TransactionStatus.running),
-            ready_transactions)
-        running_transactions = filter(
-            lambda t: t.status == TransactionStatus.running and t.next_op is not None,
-            self.transactions)
-        blocked_transactions = filter(
-            lambda t: t.status == TransactionStatus.blocked,
-            self.transactions)
-        running_transactions.sort(key=lambda t: t.next_op.id)
-        for t in running_transactions:
-            t.next_operation()
+        Detect deadlock (or kill wounded transactions) after try to run all operation
+        """
+        start = time.time()
+        ready_transactions = self._with_status(TransactionStatus.ready)
+        for t in ready_transactions:
+            t.set_status(TransactionStatus.running)
+            self.schedule(t)
+        blocked_transactions = self._with_status(TransactionStatus.blocked)
+        # operations scheduled from now on run in the next tick
+        running_queue, self._op_queue = self._op_queue, list()
+        operations = self._dispatch(running_queue)
         # if blocked => ready: run it
-        waked_transactions = filter(
-            lambda t: t.status == TransactionStatus.ready,
-            blocked_transactions)
-        waked_transactions.sort(key=lambda t: t.next_op.id)
-        map(lambda t: t.set_status(TransactionStatus.running),
-            waked_transactions)
-        for t in waked_transactions:
-            t.next_operation()
+        waked_queue = list()
+        for t in blocked_transactions:
+            if t.status == TransactionStatus.ready:
+                t.set_status(TransactionStatus.running)
+                self._enqueue(t, waked_queue)
+        operations += self._dispatch(waked_queue)
 
-        created_transactions = filter(
-            lambda t: t.status == TransactionStatus.created,
-            self.transactions)
+        created_transactions = self._with_status(TransactionStatus.created)
         map(lambda t: t.set_status(TransactionStatus.ready),
             created_transactions)
-        self.detect_deadlocks()
+        detection = time.time()
+        if self.policy is Policy.wound_wait:
+            self.kill_wounded()
+        else:
+            self.detect_deadlocks()
+        self.metrics.detection(time.time() - detection)
+        if self._gc_due():
+            self.collect_garbage()
+        if self.catchup_rate:
+            for s in self.sites:
+                if s.catching_up and s.status == site.Status.running:
+                    s.catch_up(self.catchup_rate)
+        if self.durable:
+            if self.checkpoint_interval and self.timestamp % self.checkpoint_interval == 0:
+                self.checkpoint()
+            else:
+                self.flush_logs()
+        self.metrics.tick(time.time() - start, operations,
+            len(self._status_index[TransactionStatus.blocked]))
+        if self.profiler is not None:
+            self.profiler.sample(self)
+
+    def collect_garbage(self):
+        """
+        Drop versions that no read-only transaction can see any more.
+        The oldest active read-only transaction (or the current time if there is none,
+        later ones start after it) needs the last version before its creation time and
+        everything after it. Latest versions are always kept.
+
+        :return:    number of versions reclaimed at all sites
+        """
+        horizon = self.timestamp
+        for t in self._read_only:
+            horizon = min(horizon, t.creation_timestamp)
+            break # the first one is the oldest
+        reclaimed = sum(s.collect_garbage(horizon) for s in self.sites)
+        self.gc_reclaimed += reclaimed
+        logging.info(
+            'garbage collection at %d reclaimed %d versions before %d',
+            self.timestamp, reclaimed, horizon)
+        return reclaimed
+
+    def flush_logs(self):
+        """
+        Write what the sites logged since the last flush, one write per site
+
+        :return:    number of records written
+        """
+        return sum(s.log.flush() for s in self.sites)
+
+    def checkpoint(self):
+        """
+        Write a checkpoint of every site, which also flushes and truncates its log
+
+        :return:    total size of the checkpoints in bytes
+        """
+        size = sum(s.checkpoint() for s in self.sites)
+        logging.info('checkpoint at %d wrote %d bytes', self.timestamp, size)
+        return size
+
+    def log_stats(self):
+        """
+        :return:    dictionary of log records, flushes, bytes written to the logs and
+                    checkpoints taken, added up over all sites
+        """
+        logs = [s.log for s in self.sites]
+        return dict(records=sum(l.records for l in logs), flushes=sum(l.flushes for l in logs),
+            bytes=sum(l.bytes_written for l in logs),
+            checkpoints=sum(l.checkpoints for l in logs))
+
+    def read_counts(self):
+        """
+        :return: list of the number of successful reads at each site
+        """
+        return [s.read_count for s in self.sites]
+
+    def lock_stats(self):
+        """
+        :return: lock table counters of all sites added up, see Site.lock_stats
+        """
+        stats = dict()
+        for s in self.sites:
+            for k, v in s.lock_stats.iteritems():
+                stats[k] = stats.get(k, 0) + v
+        return stats
 
     def detect_deadlocks(self):
         """
-        SCC is used to detect cycles from all blocked transactions.
-        Youngest Transaction in a SCC is scheduled to be killed
-        The while loop will end until there is no SCC with size larger than one exists in blocked transactions.
+        Cycles are searched incrementally from transactions that started waiting since the last tick.
+        Youngest Transaction in a SCC is scheduled to be killed, until no cycle is left.
         """
-        blocked_transactions = filter(
-            lambda t: t.status == TransactionStatus.blocked,
-            self.transactions)
-        if len(blocked_transactions) <= 1:
-            return
-        SCCs = self._get_SCCs(blocked_transactions)
-        to_kill = list()
-        while self._check_SCCs(SCCs):
-            for SCC in SCCs:
-                if len(SCC) >= 2:
-                    SCC.sort(key=lambda t: t.creation_timestamp, reverse=True)
-                    to_kill.append(SCC[0])
-                    blocked_transactions = [t for t in blocked_transactions if t != SCC[0]]
-            SCCs = self._get_SCCs(blocked_transactions)
-        # kill youngest
-        to_kill.sort(key=lambda t: t.creation_timestamp, reverse=True)
-        for t in to_kill:
+        for t in self.wait_for_graph.detect():
+            self.metrics.abort(DEADLOCK)
             t.kill()
 
+    def kill_wounded(self):
+        """
+        Wound-wait: abort the transactions wounded by older ones during this tick, youngest first
+        """
+        wounded = sorted(self._wounded, key=lambda t: t.priority, reverse=True)
+        self._wounded.clear()
+        for t in wounded:
+            if t.status not in FINISHED:
+                self.metrics.abort(WOUNDED)
+                t.kill()
+
+    def block(self, t, blockers):
+        """
+        Transaction t has to wait for blockers
+        With wound-wait, younger blockers are wounded and will be killed at the end of the tick
+
+        :param t:           the blocked transaction
+        :param blockers:    transactions that t waits for
+        """
+        self.wait_for_graph.add_edges(t, blockers)
+        if self.policy is Policy.wound_wait:
+            for b in blockers:
+                if b.priority > t.priority:
+                    self._wounded[b] = None
+
     def new_transaction(self, t):
-        self.transactions.append(t)
+        self._txn_seq += 1
+        t.seq = self._txn_seq
+        self.transactions[t] = None
+        self._status_index[t.status][t] = None
+        if isinstance(t, ReadOnlyTransaction):
+            self._read_only[t] = None
+
+    def update_status(self, t, old, new):
+        """
+        Move a transaction between status indexes, called by Transaction.set_status
+        Committed and aborted transactions leave the active transactions
+
+        :param t:   the transaction whose status changed
+        :param old: the previous status
+        :param new: the new status
+        """
+        if t not in self.transactions:
+            return
+        self._status_index[old].pop(t, None)
+        if new in FINISHED:
+            del self.transactions[t]
+            self._read_only.pop(t, None)
+            if new is TransactionStatus.committed:
+                self.committed += 1
+            else:
+                self.aborted += 1
+        else:
+            self._status_index[new][t] = None
+
+    def schedule(self, t):
+        """
+        Queue the next operation of a running transaction for the next dispatch
+
+        :param t:   the transaction to schedule
+        """
+        self._enqueue(t, self._op_queue)
 
     def get_op_id(self):
         """
@@ -97,45 +284,91 @@ class TransactionManager(object):
         self._op_id += 1
         return self._op_id
 
-    def _check_SCCs(self, sccs):
-        for scc in sccs:
-            if len(scc) >= 2:
-                return True
+    def _enqueue(self, t, queue):
+        """
+        Push the next operation of t into a heap of (operation id, sequence, transaction)
+        Only the latest entry of a transaction is valid, older entries are skipped when popped
+        """
+        op = t.next_op
+        if t.status != TransactionStatus.running or op is None:
+            return
+        self._queue_seq += 1
+        t.queue_seq = self._queue_seq
+        heapq.heappush(queue, (op.id, self._queue_seq, t))
+
+    def _dispatch(self, queue):
+        """
+        Run operations in FIFO order of operation id until the heap is drained
+        Commits of read/write transactions that come one after another are run as a group
+        Transactions that can go on are rescheduled for the next tick
+
+        :return:    number of operations run
+        """
+        operations = 0
+        while queue:
+            _, seq, t = heapq.heappop(queue)
+            if t.queue_seq != seq or t.status != TransactionStatus.running:
+                continue
+            t.queue_seq = None
+            if _commits_next(t):
+                group = self._pop_commits(queue, t)
+                if len(group) > 1:
+                    ReadWriteTransaction.commit_group(group)
+                    operations += len(group)
+                    continue
+            t.next_operation()
+            operations += 1
+            self.schedule(t)
+        return operations
+
+    def _pop_commits(self, queue, t):
+        """
+        :return:    t and the transactions popped from the heap whose commits follow t's
+                    without other operations in between, in FIFO order
+        """
+        group = [t]
+        while queue:
+            _, seq, u = queue[0]
+            if u.queue_seq != seq or u.status != TransactionStatus.running:
+                heapq.heappop(queue)
+                continue
+            if not _commits_next(u):
+                break
+            heapq.heappop(queue)
+            u.queue_seq = None
+            group.append(u)
+        return group
+
+    def _open_logs(self, wal_dir, sync):
+        """
+        Attach a log to every site, restore their state and continue after the latest time stamp
+        """
+        if not os.path.isdir(wal_dir):
+            os.makedirs(wal_dir)
+        restored = [s.attach_log(SiteLog(os.path.join(wal_dir, 'site%d' % s.idx), sync))
+            for s in self.sites]
+        restored = [ts for ts in restored if ts is not None]
+        if restored:
+            self.timestamp = max(restored)
+            logging.info('restored %d sites from %s at %d',
+                len(restored), wal_dir, self.timestamp)
+
+    def _gc_due(self):
+        if self.gc_interval and self.timestamp % self.gc_interval == 0:
+            return True
+        if self.gc_threshold is not None:
+            return sum(s.version_count for s in self.sites) > self.gc_threshold
         return False
 
-    def _get_SCCs(self, transactions):
-        stack = []
-        visited = {}
-        for t in transactions:
-            visited[t] = False
-        for t in transactions:
-            if not visited[t]:
-                self._fillOrder(transactions, t, visited, stack)
-        # Second DFS
-        for t in transactions:
-            visited[t] = False
-        res = list()
-        SCC = list()
-        while stack:
-            t = stack.pop()
-            if not visited[t]:
-                self._second_DFS(transactions, t, visited, SCC)
-                res.append(SCC)
-                SCC = list()
-        return res
-
-    def _second_DFS(self, transactions, v, visited, SCC):
-        visited[v] = True
-        SCC.append(v)
-        for t in v.waited_by:
-            if t in transactions:
-                if not visited[t]:
-                    self._second_DFS(transactions, t, visited, SCC)
-
-    def _fillOrder(self, transactions, v, visited, stack):
-        visited[v] = True
-        for t in v.wait_for:
-            if t in transactions:
-                if not visited[t]:
-                    self._fillOrder(transactions, t, visited, stack)
-        stack = stack.append(v)
+    def _with_status(self, status):
+        """
+        :return: a snapshot list of active transactions with the given status
+        """
+        return list(self._status_index[status])
+
+
+def _commits_next(t):
+    """
+    :return:    True if the next operation of t is the commit of a read/write transaction
+    """
+    return isinstance(t, ReadWriteTransaction) and t.next_op.code is Opcode.commit
@@ -0,0 +1,133 @@
+# -----------------------------------------------------------------------------
+# version_store.py
+#
+# Classes for committed versions of data items
+# -----------------------------------------------------------------------------
+
+import bisect
+from array import array
+
+try:
+    INT64 = array('q').typecode
+except ValueError:
+    # no long long arrays before python 3.3, long is 64-bit on LP64 platforms
+    INT64 = 'l'
+
+
+class VersionStore(object):
+    """
+    Committed versions of the data items at one site, keyed by item id.
+    Timestamps and values of an item are kept in two parallel typed arrays of 64-bit
+    integers, sorted by timestamp. Values that do not fit are kept in a list instead.
+    """
+    def __init__(self):
+        """
+        Create an empty store
+        Items that have more than one version are tracked for garbage collection
+        """
+        self._timestamps = dict()
+        self._values = dict()
+        self._multiversion = set()
+        self.version_count = 0
+
+    def __contains__(self, item_id):
+        return item_id in self._timestamps
+
+    def __iter__(self):
+        return iter(self._timestamps)
+
+    def load(self, pairs, ts):
+        """
+        Add an initial version for items that have no version yet
+
+        :param pairs:   list of (item id, value)
+        :param ts:      time stamp of the initial versions
+        """
+        timestamps = self._timestamps
+        values = self._values
+        for item_id, val in pairs:
+            if item_id not in timestamps:
+                timestamps[item_id] = array(INT64, (ts, ))
+                values[item_id] = self._new_values(val)
+                self.version_count += 1
+
+    def append(self, item_id, ts, val):
+        """
+        Add a new version, time stamps of an item must grow
+
+        :param item_id: the item id
+        :param ts:      commit time stamp
+        :param val:     committed value
+        """
+        if item_id not in self._timestamps:
+            self.load([(item_id, val)], ts)
+            return
+        timestamps = self._timestamps[item_id]
+        assert timestamps[-1] < ts
+        timestamps.append(ts)
+        try:
+            self._values[item_id].append(val)
+        except (OverflowError, TypeError):
+            self._values[item_id] = list(self._values[item_id]) + [val]
+        self._multiversion.add(item_id)
+        self.version_count += 1
+
+    def latest(self, item_id):
+        """
+        :return: the latest committed value of the item
+        """
+        return self._values[item_id][-1]
+
+    def before(self, item_id, ts):
+        """
+        Find the version a read at time ts sees, the last one committed strictly before ts
+
+        :return:    (commit time stamp, value), or None if there is no such version
+        """
+        timestamps = self._timestamps[item_id]
+        i = bisect.bisect_left(timestamps, ts) - 1
+        if i < 0:
+            return None
+        return timestamps[i], self._values[item_id][i]
+
+    def committed_since(self, item_id, ts):
+        """
+        :return: True if a version of the item was committed at or after ts
+        """
+        timestamps = self._timestamps.get(item_id)
+        if timestamps is None:
+            return False
+        return timestamps[-1] >= ts
+
+    def history(self, item_id):
+        """
+        :return: (list of time stamps, list of values) of an item, oldest first
+        """
+        return list(self._timestamps[item_id]), list(self._values[item_id])
+
+    def prune(self, horizon):
+        """
+        Drop versions that a read at or after horizon can not see, the latest version stays
+
+        :param horizon: earliest time stamp that may still be read
+        :return:        number of versions dropped
+        """
+        reclaimed = 0
+        for item_id in list(self._multiversion):
+            timestamps = self._timestamps[item_id]
+            i = bisect.bisect_left(timestamps, horizon) - 1
+            if i > 0:
+                del timestamps[:i]
+                del self._values[item_id][:i]
+                reclaimed += i
+            if len(timestamps) == 1:
+                self._multiversion.discard(item_id)
+        self.version_count -= reclaimed
+        return reclaimed
+
+    @staticmethod
+    def _new_values(val):
+        try:
+            return array(INT64, (val, ))
+        except (OverflowError, TypeError):
+            return [val]
@@ -0,0 +1,200 @@
+# -----------------------------------------------------------------------------
+# wal.py
+#
+# Classes for the write-ahead log and checkpoints of a site
+# -----------------------------------------------------------------------------
+
+import os
+
+
+class SiteLog(object):
+    """
+    Durable state of one site: a checkpoint file and a write-ahead log of what happened since.
+    Both are text files of one record per line
+        v <item id> <time stamp> <value>    a committed (or initial) version
+        f <time stamp>                      the site fails
+        r <time stamp>                      the site recovers
+        b <time stamp>                      a breakpoint, in checkpoints
+        s <0 or 1>                          1 if the site is failed, in checkpoints
+    Each file starts with a generation line g <n>. A checkpoint of generation n holds the whole
+    state up to the log of generation n, which is replaced by an empty log of generation n + 1,
+    so a log that is not newer than the checkpoint is already part of it.
+    Records are buffered and written once per tick by flush.
+    """
+    def __init__(self, path, sync=True):
+        """
+        :param path:    path prefix, the files are path.ckpt and path.log
+        :param sync:    fsync the log on every flush and checkpoints when they are written
+        """
+        self.path = path
+        self.sync = sync
+        self.generation = 0
+        self.records = 0
+        self.flushes = 0
+        self.bytes_written = 0
+        self.checkpoints = 0
+        self.failed = False
+        self._buffer = list()
+        self._file = None
+
+    @property
+    def log_path(self):
+        return self.path + '.log'
+
+    @property
+    def checkpoint_path(self):
+        return self.path + '.ckpt'
+
+    def replay(self, versions, breakpoints):
+        """
+        Rebuild the state of a site from the latest checkpoint and the log after it,
+        then open the log for appending. A torn last line of the log is ignored and cut off,
+        so that the next record does not get appended to it.
+        Versions that are already stored are skipped. Whether the site was failed at the
+        end is left in self.failed.
+
+        :param versions:    the version store to fill
+        :param breakpoints: the list of breakpoints, replaced by the checkpoint and extended by the log
+        :return:            the largest time stamp found, None if there is no saved state
+        """
+        last = None
+        generation = None
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                generation, lines, _ = self._read(f)
+                del breakpoints[:]
+                last = self._apply(lines, versions, breakpoints)
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                log_generation, lines, torn = self._read(f)
+            if generation is None or log_generation > generation:
+                ts = self._apply(lines, versions, breakpoints)
+                if torn:
+                    self._rewrite(self.log_path, log_generation, lines)
+                if ts is not None:
+                    last = ts if last is None else max(last, ts)
+                generation = log_generation
+            else:
+                generation += 1
+                self._rewrite(self.log_path, generation, ())
+        if generation is None:
+            generation = 0
+            self._rewrite(self.log_path, generation, ())
+        self.generation = generation
+        self._file = open(self.log_path, 'a')
+        return last
+
+    def version(self, item_id, ts, val):
+        self._buffer.append('v %d %d %d\n' % (item_id, ts, val))
+
+    def fail(self, ts):
+        self._buffer.append('f %d\n' % ts)
+
+    def recover(self, ts):
+        self._buffer.append('r %d\n' % ts)
+
+    def flush(self):
+        """
+        Write the buffered records with one write (and fsync)
+
+        :return:    number of records written
+        """
+        if not self._buffer:
+            return 0
+        data = ''.join(self._buffer)
+        n = len(self._buffer)
+        self._buffer = list()
+        self._file.write(data)
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.records += n
+        self.flushes += 1
+        self.bytes_written += len(data)
+        return n
+
+    def checkpoint(self, versions, breakpoints, failed):
+        """
+        Write the whole state of a site as a new checkpoint and start an empty log.
+        Pruned versions are left out, so the checkpoint is no larger than the state itself.
+
+        :param versions:    the version store of the site
+        :param breakpoints: the breakpoints of the site
+        :param failed:      True if the site is failed
+        :return:            size of the checkpoint in bytes
+        """
+        self.flush()
+        lines = ['b %d\n' % ts for ts in breakpoints]
+        lines.append('s %d\n' % failed)
+        for item_id in versions:
+            timestamps, values = versions.history(item_id)
+            lines.extend('v %d %d %d\n' % (item_id, ts, val)
+                for ts, val in zip(timestamps, values))
+        size = self._rewrite(self.checkpoint_path, self.generation, lines)
+        self._file.close()
+        self.generation += 1
+        self._rewrite(self.log_path, self.generation, ())
+        self._file = open(self.log_path, 'a')
+        self.checkpoints += 1
+        return size
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def _rewrite(self, path, generation, lines):
+        """
+        Replace a file atomically by writing a temporary file and renaming it
+
+        :return: size of the new file in bytes
+        """
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write('g %d\n' % generation)
+            f.writelines(lines)
+            f.flush()
+            if self.sync:
+                os.fsync(f.fileno())
+            size = f.tell()
+        os.rename(tmp, path)
+        return size
+
+    @staticmethod
+    def _read(f):
+        """
+        :return: (generation, list of complete record lines, True if the last line was torn)
+        """
+        lines = f.readlines()
+        torn = bool(lines) and not lines[-1].endswith('\n')
+        if torn:
+            lines.pop()
+        if not lines:
+            return 0, [], torn
+        kind, generation = lines[0].split()
+        assert kind == 'g'
+        return int(generation), lines[1:], torn
+
+    def _apply(self, lines, versions, breakpoints):
+        """
+        :return: the largest time stamp of the records, None if there are none
+        """
+        last = None
+        for line in lines:
+            fields = line.split()
+            kind = fields[0]
+            if kind == 'v':
+                item_id, ts, val = int(fields[1]), int(fields[2]), int(fields[3])
+                if not versions.committed_since(item_id, ts):
+                    versions.append(item_id, ts, val)
+            elif kind == 's':
+                self.failed = fields[1] == '1'
+                continue
+            else:
+                ts = int(fields[1])
+                breakpoints.append(ts)
+                if kind != 'b':
+                    self.failed = kind == 'f'
+            last = ts if last is None else max(last, ts)
+        return last
@@ -1,26 +1,66 @@
-import subprocess
 import os
+import logging
+import multiprocessing
+from StringIO import StringIO
+import database
+import adb
 
 
 this_dir = os.path.dirname(__file__)
 data_path = os.path.join(this_dir, 'data')
+# number of worker processes for the data scripts, set ADB_TEST_PROCESSES to use a pool
+processes = int(os.environ.get('ADB_TEST_PROCESSES', '1'))
+
 
 def test_data():
     filenames = os.listdir(data_path)
-    for infile in filenames:
-        if infile.endswith('.txt'):
-            outfile = infile[:-4] + '.ans'
-            if outfile in filenames:
-                yield check_output, infile, outfile
+    cases = [(infile, infile[:-4] + '.ans') for infile in sorted(filenames)
+        if infile.endswith('.txt') and infile[:-4] + '.ans' in filenames]
+    outputs = [None] * len(cases)
+    if processes > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            outputs = pool.map(run_file, [infile for infile, _ in cases])
+        finally:
+            pool.close()
+            pool.join()
+    for (infile, outfile), output in zip(cases, outputs):
+        yield check_output, infile, outfile, output
 
 
-def check_output(infile, outfile):
-    proj_dir = os.path.join(this_dir, os.pardir)
-    adb_path = os.path.join(proj_dir, 'src', 'adb.py')
+def run_file(infile):
+    """
+    Run one data script in this process and return its output, logging is
+    turned off as in adb.py without -v since it adds sites and ticks to the output
+    """
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(100)
     try:
-        subprocess.check_call('python %s %s | diff -w - %s' % (
-            adb_path, 
-            os.path.join(data_path, infile), 
-            os.path.join(data_path, outfile)), shell=True)
-    except:
-        assert False
\ No newline at end of file
+        with open(os.path.join(data_path, infile)) as f:
+            return database.run_script(f)
+    finally:
+        root.setLevel(level)
+
+
+def check_output(infile, outfile, output=None):
+    if output is None:
+        output = run_file(infile)
+    with open(os.path.join(data_path, outfile)) as f:
+        expected = f.read()
+    # like diff -w, white space within lines is ignored
+    assert normalize(output) == normalize(expected), infile
+
+
+def normalize(text):
+    return [''.join(line.split()) for line in text.splitlines()]
+
+
+def test_compile_standard_input():
+    lines = ['begin(T1)', 'W(T1, x2, 5); R(T1, x4)', 'end(T1)', 'dump(x2)']
+    stdin = StringIO('\n'.join(lines) + '\n')
+    stdin.name = '<stdin>'
+    out = StringIO()
+    db = database.Database(out=out)
+    db.execute(adb.compile_input(stdin))
+    assert out.getvalue() == database.run_script(lines)
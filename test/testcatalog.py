@@ -0,0 +1,79 @@
+from StringIO import StringIO
+from collections import Counter
+from transaction_manager import TransactionManager
+from catalog import Catalog
+
+
+def test_default_placement():
+    catalog = Catalog()
+    assert catalog.site_ids(1) == [1]
+    assert catalog.site_ids(9) == [9]
+    assert catalog.site_ids(19) == [9]
+    assert catalog.site_ids(2) == range(10)
+
+
+def test_hash_placement():
+    catalog = Catalog(items=50, sites=4, placement='hash', replication=3)
+    copies = Counter()
+    for i in xrange(1, 51):
+        site_ids = catalog.site_ids(i)
+        # replicas are on the sites after the first one
+        assert site_ids == [(site_ids[0] + j) % 4 for j in xrange(3)]
+        copies.update(site_ids)
+    assert sum(copies.values()) == 150
+    assert sorted(copies) == range(4)
+    assert catalog.site_ids(7) == catalog.site_ids(7)
+
+
+def test_range_placement():
+    catalog = Catalog(items=20, sites=10, placement='range', replication=2)
+    assert catalog.site_ids(1) == catalog.site_ids(2) == [0, 1]
+    assert catalog.site_ids(3) == [1, 2]
+    assert catalog.site_ids(20) == [9, 0]
+    copies = Counter()
+    for i in xrange(1, 21):
+        copies.update(catalog.site_ids(i))
+    assert copies == Counter(dict((k, 4) for k in xrange(10)))
+    assert Catalog(items=20, sites=10, placement='range').site_ids(20) == [9]
+
+
+def test_items_at_their_sites():
+    tm = TransactionManager(sites=4)
+    names = Catalog(items=50, sites=4, placement='hash', replication=3).build(tm)
+    for i in (1, 2, 37, 50):
+        x = names['x%d' % i]
+        assert [s.idx for s in x.sites] == [k + 1 for k in names.catalog.site_ids(i)]
+        assert all(s.committed_value(i) == i * 10 for s in x.sites)
+    assert 'x51' not in names
+
+
+def test_from_file():
+    config = '{"items": 50, "sites": 4, "placement": "range", "replication": 2}'
+    catalog = Catalog.from_file(StringIO(config), sites=5, replication=None)
+    assert (catalog.items, catalog.sites, catalog.replication) == (50, 5, 2)
+    assert catalog.placement == 'range'
+
+
+def test_invalid_configs():
+    configs = [
+        '{"sites": 4, "placement": "hash", "replication": 5}',
+        '{"placement": "range", "replication": 0}',
+        '{"placement": "default", "replication": 2}',
+        '{"placement": "random"}',
+        '{"items": 0}',
+        '[20, 10]',
+        '{"items": 20,',
+    ]
+    for config in configs:
+        try:
+            Catalog.from_file(StringIO(config))
+        except ValueError:
+            pass
+        else:
+            assert False, config
+    try:
+        Catalog.from_file(StringIO('{"copies": 2}'))
+    except TypeError:
+        pass
+    else:
+        assert False
@@ -0,0 +1,128 @@
+from StringIO import StringIO
+from database import Database, run_script
+import site1 as site
+from transaction import ReadWriteTransaction
+
+
+def test_method_calls_match_script():
+    script = ['begin(T1)', 'W(T1, x2, 5)', 'begin(T2); R(T2, x2)', 'end(T1)',
+        'end(T2)', 'dump(x2)']
+    out = StringIO()
+    db = Database(out=out)
+    db.begin('T1')
+    db.tick()
+    db.write('T1', 'x2', 5)
+    db.tick()
+    db.begin('T2')
+    db.read('T2', 'x2')
+    db.tick()
+    db.end('T1')
+    db.tick()
+    db.end('T2')
+    db.tick()
+    # the line of the dump is a tick too, the dump runs after it
+    db.tick()
+    db.dump('x2')
+    assert out.getvalue() == run_script(script)
+    assert db.tm.timestamp == len(script)
+
+
+def test_instances_are_independent():
+    out1, out2 = StringIO(), StringIO()
+    db1, db2 = Database(out=out1), Database(out=out2)
+    for db in (db1, db2):
+        db.begin('T1')
+        db.tick()
+    db1.write('T1', 'x1', 7)
+    db2.fail(2)
+    db1.tick()
+    db2.tick()
+    db1.end('T1')
+    db2.end('T1')
+    db1.tick()
+    db2.tick()
+    assert out1.getvalue() == out2.getvalue() == 'T1 commits\n'
+    assert db1.items['x1'].sites[0].committed_value(1) == 7
+    assert db2.items['x1'].sites[0].committed_value(1) == 10
+    assert db1.tm.sites[1].status is site.Status.running
+    assert db2.tm.sites[1].status is site.Status.failed
+    assert db1.lookup('T1') is not db2.lookup('T1')
+
+
+def test_names_are_kept_apart():
+    out = StringIO()
+    db = Database(out=out)
+    db.run(['a = 3', 'begin(T1)', 'a + 1'])
+    assert db.variables == {'a': 3}
+    assert list(db.transactions) == ['T1']
+    assert 'T1' not in db.items
+    assert out.getvalue() == '4\n'
+
+
+def test_transaction_names_are_not_taken():
+    out = StringIO()
+    db = Database(out=out)
+    db.run(['a = 3', 'begin(T1)'])
+    for name in ['a', 'T1', 'x1']:
+        try:
+            db.begin(name)
+        except AssertionError:
+            pass
+        else:
+            assert False, name
+    assert out.getvalue() == 'Error: transaction %s has started!!!\n' * 3 % ('a', 'T1', 'x1')
+    assert db.lookup('x1') is db.items['x1']
+
+
+def test_group_commit_matches_single_commits():
+    # T4 and T5 wait for locks of T1 and T2, T1, T3 and T5 accessed site 2 before it failed
+    head = ['begin(T1); begin(T2); begin(T3); begin(T4); begin(T5)',
+        'W(T1, x2, 11); W(T2, x3, 22); W(T3, x4, 33); R(T5, x1)',
+        'W(T4, x2, 44); W(T5, x3, 55)', 'fail(2)']
+    grouped = head + ['end(T1); end(T2); end(T3); end(T5)', 'end(T4)', '', 'dump()']
+    single = head + ['end(T1)', 'end(T2)', 'end(T3)', 'end(T5)', 'end(T4)', '', 'dump()']
+    groups = []
+    commit_group = ReadWriteTransaction.commit_group
+
+    def record(transactions):
+        groups.append([t.name for t in transactions])
+        commit_group(transactions)
+    ReadWriteTransaction.commit_group = staticmethod(record)
+    try:
+        out = run_script(grouped)
+        assert groups == [['T1', 'T2', 'T3'], ['T5', 'T4']]
+        assert out == run_script(single)
+    finally:
+        ReadWriteTransaction.commit_group = staticmethod(commit_group)
+    assert out.startswith('T1 aborts\nT2 commits\nT3 aborts\nT5 aborts\nT4 commits\n')
+    assert 'x2: 44 at site 1\n' in out and 'x3: 22 at site 4\n' in out
+
+
+def test_garbage_collection_keeps_versions_of_readers():
+    out = StringIO()
+    db = Database(out=out)
+    db.run(['begin(T1); W(T1, x2, 21)', 'end(T1)', '', 'beginRO(RO1)'])
+    for i in xrange(2, 5):
+        db.run(['begin(T%d); W(T%d, x2, %d)' % (i, i, 20 + i), 'end(T%d)' % i, ''])
+    # RO1 needs the version of T1 and the ones after it, the initial one goes at all 10 sites
+    assert db.tm.collect_garbage() == 10
+    assert db.tm.sites[0].versions.history(2) == ([3, 7, 10, 13], [21, 22, 23, 24])
+    db.run(['R(RO1, x2); R(RO1, x4)', 'end(RO1)', ''])
+    # values read are printed with the site and tick when logging is on
+    assert [l.split()[0] for l in out.getvalue().splitlines()[-2:]] == ['21', '40']
+    # only the latest versions are left once RO1 is done
+    assert db.tm.collect_garbage() == 30
+    assert db.tm.gc_reclaimed == 40
+    assert db.tm.sites[0].versions.history(2) == ([13], [24])
+    assert (db.tm.committed, db.tm.aborted, db.tm.completed_operations) == (5, 0, 11)
+    assert not db.tm.transactions
+
+
+def test_instances_have_own_parsers():
+    db1, db2 = Database(out=StringIO()), Database(out=StringIO())
+    assert db1.parser is not db2.parser
+    # the tables are shared, only the parse state is not
+    assert db1.parser.action is db2.parser.action
+    db1.run(['a = 2'])
+    db2.run(['a = 3'])
+    assert db1.variables == {'a': 2} and db2.variables == {'a': 3}
@@ -0,0 +1,48 @@
+import transaction
+import deadlock
+from collections import namedtuple
+
+
+TM = namedtuple('TM', ['timestamp'])
+
+
+def make_transactions(n):
+    ts = []
+    for i in xrange(n):
+        t = transaction.ReadWriteTransaction(
+            TM(i), 't%d' % i, transaction.Status.blocked)
+        ts.append(t)
+    return ts
+
+
+def test_youngest_in_cycle():
+    graph = deadlock.WaitForGraph(age=lambda t: t.creation_timestamp)
+    t0, t1, t2, t3 = make_transactions(4)
+    graph.add_edges(t0, [t1])
+    graph.add_edges(t1, [t2])
+    graph.add_edges(t2, [t0])
+    graph.add_edges(t3, [t0])
+    assert graph.detect() == [t2]
+    # nothing changed since the last detection
+    assert graph.detect() == []
+
+
+def test_remove_edges():
+    graph = deadlock.WaitForGraph(age=lambda t: t.creation_timestamp)
+    t0, t1, t2 = make_transactions(3)
+    graph.add_edges(t0, [t1, t2])
+    graph.add_edges(t2, [t1])
+    assert set(graph.remove(t1)) == set([t0, t2])
+    assert t0.wait_for == set([t2])
+    assert not t2.wait_for
+    assert graph.detect() == []
+
+
+def test_long_chain():
+    graph = deadlock.WaitForGraph(age=lambda t: t.creation_timestamp)
+    ts = make_transactions(5000)
+    for a, b in zip(ts, ts[1:]):
+        graph.add_edges(a, [b])
+    assert graph.detect() == []
+    graph.add_edges(ts[-1], [ts[0]])
+    assert graph.detect() == [ts[-1]]
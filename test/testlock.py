@@ -60,3 +60,75 @@ def test2():
 	t2.status = transaction.Status.aborted
 	assert lk.acquire(t3, lock.Mode.read)
 
+
+
+def test_policy():
+	old = transaction.ReadWriteTransaction(
+		namedtuple('TM', ['timestamp'])(1), 'old', transaction.Status.running)
+	young = transaction.ReadWriteTransaction(
+		namedtuple('TM', ['timestamp'])(2), 'young', transaction.Status.running)
+	lk = lock.FIFOLock()
+
+	assert lk.acquire(young, lock.Mode.write, lock.Policy.wait_die)
+	# older transactions wait
+	assert lk.acquire(old, lock.Mode.read, lock.Policy.wait_die) == set([young])
+	lk.release(young)
+	assert lk.acquire(old, lock.Mode.read, lock.Policy.wait_die)
+	# younger transactions die, and are not queued
+	assert lk.acquire(young, lock.Mode.write, lock.Policy.wait_die) is False
+	assert not lk.queuing
+	assert lk.acquire(young, lock.Mode.write, lock.Policy.no_wait) is False
+	assert not lk.queuing
+
+
+def test_aborted_waiter():
+	TM = namedtuple('TM', ['timestamp'])
+	t1, t2, t3, t4 = [transaction.ReadWriteTransaction(
+		TM(i), 't%d' % i, transaction.Status.running) for i in xrange(1, 5)]
+	lk = lock.FIFOLock()
+
+	assert lk.acquire(t1, lock.Mode.write)
+	assert lk.acquire(t2, lock.Mode.write) == set([t1])
+	assert lk.acquire(t3, lock.Mode.write) == set([t1, t2])
+	# an aborted waiter at the head of the queue blocks nobody
+	t2.status = transaction.Status.aborted
+	assert lk.acquire(t4, lock.Mode.write) == set([t1, t3])
+	assert list(lk.queuing) == [t3, t4]
+
+
+def test_finished_waiters():
+	TM = namedtuple('TM', ['timestamp'])
+	t1, t2, t3, t4 = [transaction.ReadWriteTransaction(
+		TM(i), 't%d' % i, transaction.Status.running) for i in xrange(1, 5)]
+	lk = lock.FIFOLock()
+
+	assert lk.acquire(t1, lock.Mode.write)
+	assert lk.acquire(t2, lock.Mode.read) == set([t1])
+	assert lk.acquire(t3, lock.Mode.write) == set([t1, t2])
+	# a transaction that ends leaves the queue wherever it is
+	lk.dequeue(t3)
+	assert list(lk.queuing) == [t2] and t3 not in lk.since
+	lk.dequeue(t3)
+	# a committed waiter at the head is dropped like an aborted one
+	t2.status = transaction.Status.committed
+	assert lk.acquire(t4, lock.Mode.write) == set([t1])
+	assert list(lk.queuing) == [t4]
+	lk.release(t1)
+	t4.status = transaction.Status.aborted
+	assert lk.idle()
+
+
+
+def test_retry_while_queuing():
+	TM = namedtuple('TM', ['timestamp'])
+	t1, t2, t3 = [transaction.ReadWriteTransaction(
+		TM(i), 't%d' % i, transaction.Status.running) for i in xrange(1, 4)]
+	lk = lock.FIFOLock()
+
+	assert lk.acquire(t1, lock.Mode.write)
+	assert lk.acquire(t2, lock.Mode.write) == set([t1])
+	assert lk.acquire(t3, lock.Mode.read) == set([t1, t2])
+	# asking again keeps the place in the queue
+	assert lk.acquire(t3, lock.Mode.read) == set([t1, t2])
+	assert lk.acquire(t2, lock.Mode.write) == set([t1])
+	assert list(lk.queuing) == [t2, t3]
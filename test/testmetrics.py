@@ -0,0 +1,64 @@
+import json
+from StringIO import StringIO
+from database import Database
+from lock import Policy
+import metrics
+import batch
+
+
+def run(lines, **options):
+    db = Database(out=StringIO(), **options)
+    db.run(lines)
+    return db
+
+
+def test_lock_wait_and_validation():
+    db = run(['begin(T1); begin(T2)', 'W(T1, x2, 1)', 'W(T2, x2, 2)',
+        'W(T1, x4, 1); fail(3)', 'end(T1)', 'end(T2)'])
+    m = db.tm.metrics
+    assert m.tick_seconds.count == 6
+    assert m.aborts == {metrics.VALIDATION: 1}
+    # T2 queued at tick 3 and got the lock at every site when T1 ended at tick 5
+    waits = m.lock_waits
+    assert waits[1, 2].count == 1 and waits[1, 2].total == 2
+    assert waits[3, 2].count == 0
+    assert m.blocked.max == 1
+
+
+def test_abort_reasons():
+    script = ['begin(T1); begin(T2)', 'W(T1, x1, 1); W(T2, x3, 1)',
+        'W(T1, x3, 2)', 'W(T2, x1, 2)']
+    assert run(script).tm.metrics.aborts == {metrics.DEADLOCK: 1}
+    assert run(script, policy=Policy.wound_wait).tm.metrics.aborts == {metrics.WOUNDED: 1}
+    assert run(script, policy=Policy.no_wait).tm.metrics.aborts == {metrics.DIED: 1}
+
+
+def test_stats_command():
+    out = StringIO()
+    db = Database(out=out)
+    db.run(['begin(T1); W(T1, x2, 1)', 'end(T1)', 'stats()'])
+    # the commit is printed first
+    stats = json.loads(out.getvalue().split('\n', 1)[1])
+    assert stats['ticks'] == 3
+    assert stats['operations_per_tick']['total'] == 2
+    out.truncate(0)
+    db.stats('csv')
+    rows = out.getvalue().splitlines()
+    assert rows[0] == 'metric,site,item,count,total,mean,max'
+    assert rows[2].startswith('operations_per_tick,,,3,2,')
+
+
+def test_stats_is_reserved():
+    out = StringIO()
+    db = Database(out=out)
+    # plain lines and lines the full parser reads treat stats the same way
+    db.run(['begin(stats)', 'begin(T1); a = 1', 'end(stats)'])
+    assert out.getvalue() == "Syntax error at 'stats'\n" * 2
+    assert 'stats' not in db.transactions
+    lines = ['begin(T1); W(T1, x2, 1)', 'end(T1)', 'stats()']
+    program = batch.compile_lines(lines)
+    assert list(program)[-1] == [(batch.STATS, 0, 0, 0)]
+    out = StringIO()
+    Database(out=out).execute(program)
+    stats = json.loads(out.getvalue().split('\n', 1)[1])
+    assert stats['ticks'] == 3
@@ -0,0 +1,48 @@
+from StringIO import StringIO
+from database import Database
+import profiler
+from profiler import ContentionProfiler
+
+
+def profile(lines, **options):
+    profiler = ContentionProfiler(**options)
+    Database(out=StringIO(), profiler=profiler).run(lines)
+    return profiler
+
+
+def test_queue_behind_writer():
+    p = profile(['begin(T1); begin(T2); begin(T3)', 'W(T1, x1, 1)', 'W(T2, x1, 2)',
+        'W(T3, x1, 3)', 'R(T1, x3)', 'end(T1)'])
+    assert p.samples == 6
+    # x1 is only at site 2, T2 queues at tick 3 and T3 at tick 4, T1 ends at tick 6
+    # and T2 gets the lock, so T3 still waits for it
+    assert p.hot_items() == [('x1', 6, 4, 2)]
+    assert p.longest_chains() == [(['T3', 'T2', 'T1'], 4)]
+    assert p.queue_depths() == [(2, 'x1', 6 / 5.0, 2, 5)]
+    assert p.top_blockers() == [('T1', 5), ('T2', 3)]
+
+
+def test_top_limits_lists():
+    lines = ['begin(T%d)' % i for i in xrange(1, 5)]
+    lines += ['W(T%d, x%d, 0)' % (i, 2 * i - 1) for i in xrange(1, 5)]
+    lines += ['W(T%d, x%d, 1)' % (i + 1, 2 * i - 1) for i in xrange(1, 4)]
+    p = profile(lines, top=2)
+    assert len(p.hot_items()) == 2
+    assert len(p.top_blockers()) == 2
+    out = StringIO()
+    p.report(out)
+    assert out.getvalue().startswith('contention profile over %d ticks' % len(lines))
+
+
+def test_long_chain():
+    class Waiter(object):
+        def __init__(self, seq):
+            self.seq = seq
+
+    # longer than the recursion limit, each one waits for the one before it
+    waiters = [Waiter(i) for i in xrange(5000)]
+    waits = dict((w, set([v])) for v, w in zip(waiters, waiters[1:]))
+    waits[waiters[0]] = set([waiters[-1]])
+    chain = profiler._longest_chain(waits)
+    assert len(chain) == 5000
+    assert chain[0] is waiters[0] and chain[1] is waiters[-1]
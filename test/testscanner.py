@@ -0,0 +1,20 @@
+import scanner
+
+
+def test_plain_commands():
+    assert scanner.scan('begin(T1); BeginRO (T2, T3)\n') == [
+        ('begin', ['T1']), ('beginro', ['T2', 'T3'])]
+    assert scanner.scan('W(T1, x2, -5); R(T1,x2); // comment') == [
+        ('w', ['T1', 'x2', -5]), ('r', ['T1', 'x2'])]
+    assert scanner.scan('fail(2); recover(2); dump(); dump(x1); dump(3); Stats(); quit') == [
+        ('fail', [2]), ('recover', [2]), ('dump', []), ('dump', ['x1']),
+        ('dump', [3]), ('stats', []), ('quit', [])]
+    assert scanner.scan('\n') == []
+
+
+def test_fallback():
+    for s in ['R(T1, (x2))', 'W(T1, x2, 1+1)', 'a = T1', 'x1', ';;',
+              'R(T1, x2);; R(T1, x3)', 'begin(R)', 'end(1)', 'fail(T1)',
+              'dump(x1, x2)', 'R(T1)', 'quit()', 'begin(T 1)', 'R(T1,x2)\r',
+              'begin(stats)', 'stats(1)']:
+        assert scanner.scan(s) is None, s
@@ -0,0 +1,131 @@
+from StringIO import StringIO
+import transaction
+from database import Database
+from transaction_manager import TransactionManager
+from catalog import Catalog
+from routing import Routing
+
+
+def start(tm, name):
+    t = transaction.ReadWriteTransaction(tm, name, transaction.Status.running)
+    tm.new_transaction(t)
+    return t
+
+
+def test_idle_locks_reclaimed():
+    tm = TransactionManager()
+    names = Catalog().build(tm)
+    s = tm.sites[0]
+    t1 = start(tm, 't1')
+    t2 = start(tm, 't2')
+    assert s.write(t1, names['x2'], 1) is True
+    assert s.write(t2, names['x2'], 2) == set([t1])
+    assert len(s.lock_table) == 1
+    t2.kill()
+    tm.sleep()
+    s.commit(t1)
+    # t2 only waited, the lock is dropped with t1's release
+    assert not s.lock_table
+    stats = s.lock_stats
+    assert stats['created'] == 1 and stats['reclaimed'] == 1
+    t3 = start(tm, 't3')
+    assert s.write(t3, names['x4'], 3) is True
+    assert s.lock_stats['reused'] == 1
+
+
+def test_round_robin_reads():
+    tm = TransactionManager(routing=Routing.round_robin)
+    names = Catalog().build(tm)
+    t = start(tm, 't1')
+    for _ in tm.sites:
+        assert t.read(names['x2']) is not False
+    assert tm.read_counts() == [1] * len(tm.sites)
+
+
+def test_catch_up_after_recovery():
+    tm = TransactionManager(catchup_rate=10)
+    names = Catalog().build(tm)
+    s, peer = tm.sites[0], tm.sites[1]
+    x2, x4 = names['x2'], names['x4']
+    s.fail()
+    tm.sleep()
+    t1 = start(tm, 't1')
+    assert peer.write(t1, x2, 7) is True
+    tm.sleep()
+    peer.commit(t1)
+    t2 = start(tm, 't2')
+    assert peer.write(t2, x4, 8) is True
+    tm.sleep()
+    s.recover()
+    assert not s.readable(x2)
+    s.catch_up(tm.catchup_rate)
+    assert s.readable(x2) and s.committed_value(x2.id) == 7
+    # x4 may still be committed without this site
+    assert not s.readable(x4) and s.catching_up
+    tm.sleep()
+    peer.commit(t2)
+    s.catch_up(tm.catchup_rate)
+    assert s.readable(x4) and s.committed_value(x4.id) == 8
+    assert not s.catching_up
+
+
+def test_catch_up_items_created_after_recovery():
+    tm = TransactionManager(catchup_rate=10)
+    names = Catalog().build(tm)
+    s = tm.sites[0]
+    s.fail()
+    tm.sleep()
+    s.recover()
+    tm.sleep()
+    # x6 is created by its first use, after the recovery
+    x6 = names['x6']
+    assert not s.readable(x6) and s.catching_up
+    s.catch_up(tm.catchup_rate)
+    assert s.readable(x6) and s.committed_value(x6.id) == 60
+
+
+
+def test_catch_up_replicated_items_only():
+    tm = TransactionManager(catchup_rate=10)
+    names = Catalog(lazy=False).build(tm)
+    # site 2 stores x1 and x11, which have no other copy, and the ten even variables
+    s = tm.sites[1]
+    s.fail()
+    tm.sleep()
+    s.recover()
+    tm.sleep()
+    assert s.readable(names['x1']) and s.readable(names['x11'])
+    assert s.catch_up(tm.catchup_rate) == 10
+    assert not s.catching_up
+    tm = TransactionManager(catchup_rate=10)
+    names = Catalog().build(tm)
+    s = tm.sites[1]
+    s.fail()
+    tm.sleep()
+    s.recover()
+    tm.sleep()
+    assert names['x1'].sites == [s]
+    assert not s.catching_up
+
+def test_committed_reader_leaves_queues():
+    out = StringIO()
+    db = Database(out=out)
+    # T2 queues for x2 at site 2 behind T1, then at site 1 behind T3, which wrote the only
+    # current copy there. T3 is the deadlock victim, so site 1 is stale again and T2 reads
+    # x2 at site 2, the queue at site 1 must not keep it after it committed
+    db.run(['begin(T1); begin(T2); begin(T3)', 'W(T1, x2, 1)', 'fail(1)', 'R(T2, x2)',
+        'recover(1)', 'W(T3, x2, 3)', 'end(T1)', 'end(T2)', ''])
+    assert out.getvalue().splitlines()[:3] == ['T1 aborts', 'T3 aborts', 'T2 commits']
+    for s in db.tm.sites:
+        assert not s.lock_table
+
+
+def test_read_at_another_copy_leaves_queue():
+    db = Database(out=StringIO())
+    # as above, T2 is woken after T3 aborted and reads x2 at site 2 before it ends
+    db.run(['begin(T1); begin(T2); begin(T3)', 'W(T1, x2, 1)', 'fail(1)', 'R(T2, x2)',
+        'recover(1)', 'W(T3, x2, 3)', 'end(T1)', 'end(T2)'])
+    t2 = db.transactions['T2']
+    assert t2.status is transaction.Status.running and not t2.queued
+    assert t2.accessed.keys() == [db.tm.sites[1]]
+    assert not db.tm.sites[0].lock_table
@@ -0,0 +1,57 @@
+from version_store import VersionStore
+
+
+def test_values_that_overflow():
+    big = 2 ** 70
+    store = VersionStore()
+    store.load([(1, 10), (2, big)], 0)
+    store.append(1, 3, big)
+    store.append(1, 5, 12)
+    store.append(2, 4, 7)
+    assert store.history(1) == ([0, 3, 5], [10, big, 12])
+    assert store.history(2) == ([0, 4], [big, 7])
+    assert store.latest(1) == 12
+    assert store.before(1, 4) == (3, big)
+    assert store.version_count == 5
+
+
+def test_before():
+    store = VersionStore()
+    store.load([(1, 10)], 2)
+    store.append(1, 5, 11)
+    # a version committed at ts is not seen by a read at ts
+    assert store.before(1, 2) is None
+    assert store.before(1, 3) == (2, 10)
+    assert store.before(1, 5) == (2, 10)
+    assert store.before(1, 6) == (5, 11)
+
+
+def test_committed_since():
+    store = VersionStore()
+    assert not store.committed_since(1, 0)
+    store.load([(1, 10)], 0)
+    store.append(1, 4, 11)
+    assert store.committed_since(1, 4)
+    assert not store.committed_since(1, 5)
+    # an initial version for an item that has one already is ignored
+    store.load([(1, 20)], 6)
+    assert store.history(1) == ([0, 4], [10, 11])
+    assert 1 in store and 2 not in store
+
+
+def test_prune():
+    store = VersionStore()
+    store.load([(1, 10), (2, 20)], 0)
+    for ts in (2, 4, 6):
+        store.append(1, ts, ts)
+    store.append(2, 3, 21)
+    assert store.version_count == 6
+    # a read at 5 or later sees the version of 4 of x1 and of 3 of x2
+    assert store.prune(5) == 3
+    assert store.history(1) == ([4, 6], [4, 6])
+    assert store.history(2) == ([3], [21])
+    assert store.prune(5) == 0
+    assert store.prune(100) == 1
+    assert store.history(1) == ([6], [6])
+    assert store.version_count == 2
+    assert store.prune(100) == 0
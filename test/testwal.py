@@ -0,0 +1,123 @@
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+import transaction
+from database import Database
+from transaction_manager import TransactionManager
+from catalog import Catalog
+from wal import SiteLog
+from version_store import VersionStore
+import site1 as site
+
+
+def start(tm, name):
+    t = transaction.ReadWriteTransaction(tm, name, transaction.Status.running)
+    tm.new_transaction(t)
+    return t
+
+
+def run(wal_dir, **options):
+    tm = TransactionManager(wal_dir=wal_dir, wal_sync=False, **options)
+    names = Catalog().build(tm)
+    s = tm.sites[0]
+    t = start(tm, 't1')
+    tm.sleep()
+    assert s.write(t, names['x2'], 7) is True
+    tm.sleep()
+    s.commit(t)
+    tm.sites[1].fail()
+    tm.next_tick()
+    return tm
+
+
+def restart(wal_dir):
+    tm = TransactionManager(wal_dir=wal_dir, wal_sync=False)
+    names = Catalog().build(tm)
+    return tm, names
+
+
+def test_restart():
+    wal_dir = tempfile.mkdtemp()
+    try:
+        old = run(wal_dir)
+        tm, names = restart(wal_dir)
+        assert tm.timestamp == old.timestamp
+        assert tm.sites[0].committed_value(names['x2'].id) == 7
+        assert tm.sites[1].status == site.Status.failed
+        assert tm.sites[1].breakpoints == old.sites[1].breakpoints
+    finally:
+        shutil.rmtree(wal_dir)
+
+
+def test_restart_from_checkpoint():
+    wal_dir = tempfile.mkdtemp()
+    try:
+        old = run(wal_dir, checkpoint_interval=1)
+        assert old.log_stats()['checkpoints'] == len(old.sites)
+        # a torn record at the end of the log is ignored
+        with open(os.path.join(wal_dir, 'site1.log'), 'a') as f:
+            f.write('v 4 9')
+        tm, names = restart(wal_dir)
+        assert tm.sites[0].versions.history(2) == old.sites[0].versions.history(2)
+        assert tm.sites[0].committed_value(names['x4'].id) == 40
+        assert tm.sites[1].status == site.Status.failed
+    finally:
+        shutil.rmtree(wal_dir)
+
+
+def test_restart_after_fail_and_recover():
+    wal_dir = tempfile.mkdtemp()
+    try:
+        options = dict(wal_dir=wal_dir, wal_sync=False, out=StringIO())
+        db = Database(**options)
+        db.run(['fail(3)', 'recover(3)', 'begin(T1); W(T1, x2, 5)', 'end(T1)', 'fail(4)'])
+        # x4 was stale at site 3 and was never written, site 4 failed on the last line
+        tm, names = restart(wal_dir)
+        assert not tm.sites[2].readable(names['x4'])
+        assert tm.sites[2].readable(names['x2'])
+        assert tm.sites[3].status == site.Status.failed
+    finally:
+        shutil.rmtree(wal_dir)
+
+
+def test_stale_log_skipped():
+    wal_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(wal_dir, 'site1')
+        log = SiteLog(path, sync=False)
+        assert log.replay(VersionStore(), [0]) is None
+        log.version(2, 3, 5)
+        log.flush()
+        store = VersionStore()
+        store.append(2, 3, 5)
+        log.checkpoint(store, [0], False)
+        log.close()
+        # as if the process stopped before the log of the next generation replaced the old one
+        with open(path + '.log', 'w') as f:
+            f.write('g 0\nv 2 3 5\nf 4\n')
+        store, breakpoints = VersionStore(), [0]
+        log = SiteLog(path, sync=False)
+        assert log.replay(store, breakpoints) == 3
+        assert store.history(2) == ([3], [5])
+        assert breakpoints == [0] and not log.failed
+        log.close()
+    finally:
+        shutil.rmtree(wal_dir)
+
+
+def test_write_after_torn_record():
+    wal_dir = tempfile.mkdtemp()
+    try:
+        options = dict(wal_dir=wal_dir, wal_sync=False, out=StringIO())
+        Database(**options).run(['begin(T1); W(T1, x2, 5)', 'end(T1)', ''])
+        with open(os.path.join(wal_dir, 'site1.log'), 'a') as f:
+            f.write('v 4 9')
+        Database(**options).run(['begin(T2); W(T2, x2, 6)', 'end(T2)', ''])
+        with open(os.path.join(wal_dir, 'site1.log')) as f:
+            assert all(line.endswith('\n') for line in f)
+        tm, names = restart(wal_dir)
+        assert tm.sites[0].committed_value(names['x2'].id) == 6
+        assert tm.sites[0].committed_value(names['x4'].id) == 40
+    finally:
+        shutil.rmtree(wal_dir)